@@ -13,12 +13,12 @@ from core.config import Config
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "app")))
 from core.database import Base
-from models import user_model, task_model  # import all models
+from models import user_model, task_model, idempotency_model  # import all models
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
-config.set_main_option("sqlalchemy.url", Config.DATABASE_URL)  # type: ignore
+config.set_main_option("sqlalchemy.url", Config.DATABASE_DIRECT_URL)  # type: ignore
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
@@ -0,0 +1,113 @@
+"""add task count buckets for stats
+
+Revision ID: ba0a7e3565c7
+Revises: 98691eef93b1
+Create Date: 2026-10-18 16:59:35.570956
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ba0a7e3565c7'
+down_revision: Union[str, Sequence[str], None] = '98691eef93b1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Copied from models.task_model so the migration doesn't change with it
+TASK_COUNTS_FUNCTION = """
+CREATE OR REPLACE FUNCTION task_counts_apply() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO task_counts AS c (owner_id, status, due_date, count)
+        SELECT owner_id, status, coalesce(due_date, 'infinity'), count(*)
+        FROM new_rows
+        GROUP BY 1, 2, 3 ORDER BY 1, 2, 3
+        ON CONFLICT (owner_id, status, due_date)
+        DO UPDATE SET count = c.count + EXCLUDED.count;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO task_counts AS c (owner_id, status, due_date, count)
+        SELECT owner_id, status, coalesce(due_date, 'infinity'), -count(*)
+        FROM old_rows
+        GROUP BY 1, 2, 3 ORDER BY 1, 2, 3
+        ON CONFLICT (owner_id, status, due_date)
+        DO UPDATE SET count = c.count + EXCLUDED.count;
+    ELSE
+        -- Only updates that move a task between buckets write anything
+        INSERT INTO task_counts AS c (owner_id, status, due_date, count)
+        SELECT owner_id, status, due_date, sum(delta)
+        FROM (
+            SELECT owner_id, status, coalesce(due_date, 'infinity') AS due_date,
+                   1 AS delta
+            FROM new_rows
+            UNION ALL
+            SELECT owner_id, status, coalesce(due_date, 'infinity'), -1
+            FROM old_rows
+        ) AS changes
+        GROUP BY 1, 2, 3 HAVING sum(delta) <> 0 ORDER BY 1, 2, 3
+        ON CONFLICT (owner_id, status, due_date)
+        DO UPDATE SET count = c.count + EXCLUDED.count;
+    END IF;
+    RETURN NULL;
+END
+$$
+"""
+
+TASK_COUNTS_TRIGGERS = (
+    """
+    CREATE TRIGGER tasks_count_insert AFTER INSERT ON tasks
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION task_counts_apply()
+    """,
+    """
+    CREATE TRIGGER tasks_count_update AFTER UPDATE ON tasks
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION task_counts_apply()
+    """,
+    """
+    CREATE TRIGGER tasks_count_delete AFTER DELETE ON tasks
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION task_counts_apply()
+    """,
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table('task_counts',
+    sa.Column('owner_id', sa.String(length=36), nullable=False),
+    sa.Column('status', postgresql.ENUM(name='taskstatus', create_type=False), nullable=False),
+    sa.Column('due_date', sa.Date(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('owner_id', 'status', 'due_date')
+    )
+    # ### end Alembic commands ###
+    op.execute(TASK_COUNTS_FUNCTION)
+    for trigger in TASK_COUNTS_TRIGGERS:
+        op.execute(trigger)
+    # Triggers are in place, so writes from here on are counted as well
+    op.execute(
+        """
+        INSERT INTO task_counts (owner_id, status, due_date, count)
+        SELECT owner_id, status, coalesce(due_date, 'infinity'), count(*)
+        FROM tasks
+        GROUP BY 1, 2, 3
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER tasks_count_delete ON tasks")
+    op.execute("DROP TRIGGER tasks_count_update ON tasks")
+    op.execute("DROP TRIGGER tasks_count_insert ON tasks")
+    op.execute("DROP FUNCTION task_counts_apply()")
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_table('task_counts')
+    # ### end Alembic commands ###
@@ -1,9 +1,44 @@
 from typing import Annotated
-from fastapi import Depends
+from fastapi import Depends, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from core.database import get_db
+from core.config import Config
+from core.database import get_async_db, get_db
+from core.replicas import replica_router
 from schemas.user_schema import UserResponse
-from core.security import get_current_user
+from core.security import (
+    get_async_read_db,
+    get_current_reader,
+    get_current_reader_async,
+    get_current_user,
+    get_current_user_async,
+    get_read_db,
+)
 
-DBSession = Annotated[Session, Depends(get_db)]
-Current_User_Dependency = Annotated[UserResponse, Depends(get_current_user)]
+# Routes are written once and hand the session to core.database.run_db,
+# which works with either flavour; ASYNC_DB picks which one is injected
+if Config.ASYNC_DB:
+    DBSession = Annotated[AsyncSession, Depends(get_async_db)]
+    _User = Annotated[UserResponse, Depends(get_current_user_async)]
+    # Read-only routes may be served by a replica, see core.replicas
+    ReadDBSession = Annotated[AsyncSession, Depends(get_async_read_db)]
+    Current_Reader_Dependency = Annotated[
+        UserResponse, Depends(get_current_reader_async)
+    ]
+else:
+    DBSession = Annotated[Session, Depends(get_db)]
+    _User = Annotated[UserResponse, Depends(get_current_user)]
+    ReadDBSession = Annotated[Session, Depends(get_read_db)]
+    Current_Reader_Dependency = Annotated[UserResponse, Depends(get_current_reader)]
+
+
+async def _current_user(
+    request: Request, response: Response, user: _User
+) -> UserResponse:
+    # Send the user's reads to the primary for a while after they write
+    if request.method not in ("GET", "HEAD", "OPTIONS"):
+        replica_router.note_write(user.id, request, response)
+    return user
+
+
+Current_User_Dependency = Annotated[UserResponse, Depends(_current_user)]
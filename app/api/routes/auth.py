@@ -1,58 +1,63 @@
 from fastapi import APIRouter, HTTPException, status
 from schemas.user_schema import UserCreate, UserLogin, UserResponse
-from ..deps import DBSession, Current_User_Dependency
+from ..deps import DBSession, Current_Reader_Dependency
 from models.user_model import User
-from sqlalchemy import or_, func
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from core.database import run_db, violated_constraint
 from core.security import Bcrypt, Token, authenticate_user, JWTHandler
 
 
 auth_router = APIRouter(prefix="/api/auth", tags=["Auth"])
 
 
+# Unique indexes on users and the error each one maps to
+_USER_CONFLICTS = {
+    "ix_users_username": "A user with this username already exists",
+    "ix_users_email": "A user with this email already exists",
+    "ix_users_email_lower": "A user with this email already exists",
+}
+
+
+def _insert_user(username: str, email: str, hashed_password: str, db: Session):
+    """Insert a user with one INSERT ... RETURNING; the unique indexes on
+    username and lower(email) do the duplicate checks"""
+    stmt = (
+        insert(User)
+        .values(username=username, email=email, hashed_password=hashed_password)
+        .returning(User)
+    )
+    try:
+        user = UserResponse.model_validate(db.scalar(stmt))
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=_USER_CONFLICTS.get(
+                violated_constraint(e) or "",
+                "A user with this username or email already exists",
+            ),
+        )
+    return user
+
+
 @auth_router.post("/register", response_model=UserResponse)
-def create_user(db: DBSession, request: UserCreate):
+async def create_user(db: DBSession, request: UserCreate):
     # normalize inputs
     normalized_username = request.username.strip()
     normalized_email = request.email.strip().lower()
 
-    # check if a user with same username OR email exists (email check is case-insensitive)
-    existing_user = (
-        db.query(User)
-        .filter(
-            or_(
-                User.username == normalized_username,
-                func.lower(User.email) == normalized_email,
-            )
-        )
-        .first()
-    )
-
-    if existing_user:
-        if str(existing_user.username) == normalized_username:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="A user with this username already exists",
-            )
-        if existing_user.email.lower() == normalized_email:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="A user with this email already exists",
-            )
-
-    new_user = User(
-        username=normalized_username,
-        email=normalized_email,
-        hashed_password=Bcrypt.hash_password(request.password),
+    hashed_password = await Bcrypt.hash_password_async(request.password)
+    return await run_db(
+        _insert_user, db, normalized_username, normalized_email, hashed_password
     )
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    return new_user
 
 
 @auth_router.post("/login", response_model=Token)
-def login(db: DBSession, request: UserLogin):
-    user = authenticate_user(request.email, request.password, db)
+async def login(db: DBSession, request: UserLogin):
+    user = await authenticate_user(request.email, request.password, db)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid credentials"
@@ -63,5 +68,5 @@ def login(db: DBSession, request: UserLogin):
 
 
 @auth_router.get("/me", response_model=UserResponse)
-def get_me(user: Current_User_Dependency):
+async def get_me(user: Current_Reader_Dependency):
     return user
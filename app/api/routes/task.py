@@ -1,64 +1,526 @@
-from fastapi import APIRouter, HTTPException, status
+import asyncio
+from datetime import date
+import time
+from anyio import from_thread
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.exc import DatabaseError
-from schemas.task_schema import TaskCreate, TaskUpdate, TaskResponse
-from api.deps import Current_User_Dependency, DBSession
-from services import task_service
+from core.config import Config
+from core.database import SessionLocal, release_db, run_db
+from core.events import task_events
+from core.security import JWTHandler, event_stream_token, get_current_user
+from models.task_model import TaskStatus
+from schemas.task_schema import (
+    TaskBatchCreate,
+    TaskBatchDelete,
+    TaskBatchResponse,
+    TaskBatchUpdate,
+    TaskChangesResponse,
+    TaskCreate,
+    TaskFileFormat,
+    TaskImportResponse,
+    TaskPatch,
+    TaskResponse,
+    TaskSortField,
+    TaskStats,
+    TaskUpdate,
+    dump_task_rows,
+)
+from api.deps import (
+    Current_Reader_Dependency,
+    Current_User_Dependency,
+    DBSession,
+    ReadDBSession,
+)
+from services import idempotency_service, task_service
 
 task_router = APIRouter(prefix="/api/tasks", tags=["Tasks"])
 
+# Maximum SQL statements per successful request, including the user lookup
+# that get_current_user does on a cache miss. Checked by the query budget
+# middleware in main.py.
+QUERY_BUDGETS = {
+    ("POST", "/api/tasks/"): 2,
+    # One more than a 304, which only runs the ETag query
+    ("GET", "/api/tasks/"): 3,
+    ("GET", "/api/tasks/{id}"): 3,
+    ("PUT", "/api/tasks/{id}"): 2,
+    ("PATCH", "/api/tasks/{id}"): 2,
+    ("DELETE", "/api/tasks/{id}"): 2,
+    ("POST", "/api/tasks/batch"): 2,
+    ("PATCH", "/api/tasks/batch"): 2,
+    ("DELETE", "/api/tasks/batch"): 2,
+    ("GET", "/api/tasks/changes"): 4,
+    ("GET", "/api/tasks/stats"): 2,
+    # Only the user lookup; the stream then waits on the shared LISTEN
+    ("GET", "/api/tasks/stream"): 1,
+    # One server-side cursor query, however many rows it streams
+    ("GET", "/api/tasks/export"): 2,
+    # Staging table, merge and NOTIFY whatever the row count. The COPY
+    # goes straight to the driver, so it isn't counted
+    ("POST", "/api/tasks/import"): 4,
+}
+
+# Added to the budget of writes sent with an Idempotency-Key: claiming the
+# key, and storing the response (or reading the stored one)
+IDEMPOTENCY_QUERIES = 2
+
+
+def _version_etag(version: int) -> str:
+    return f'"{version}"'
+
+
+def _etag(task) -> str:
+    """ETag of a Task or of a task dict returned by a write"""
+    return _version_etag(task["version"] if isinstance(task, dict) else task.version)
+
+
+# Let browsers keep the body but revalidate it on every request
+_CACHE_CONTROL = "private, no-cache"
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if if_none_match is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    candidates = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return etag in candidates
+
+
+def _not_modified(etag: str) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": etag, "Cache-Control": _CACHE_CONTROL},
+    )
+
+
+# Optional on POST /api/tasks/ and PUT /api/tasks/{id}; see
+# services.idempotency_service
+_IDEMPOTENCY_KEY = Header(None, min_length=1, max_length=255)
+
+
+async def _idempotent_write(
+    db,
+    user,
+    idempotency_key: str | None,
+    fingerprint: tuple,
+    write,
+    *args,
+    status_code: int = status.HTTP_200_OK,
+    **kwargs,
+):
+    """Run a task write service, at most once per Idempotency-Key if the
+    client sent one. Returns the service's result or a Replay"""
+    if idempotency_key is None:
+        return await run_db(write, db, *args, user=user, **kwargs)
+    return await run_db(
+        idempotency_service.run_idempotent,
+        db,
+        idempotency_key,
+        idempotency_service.request_fingerprint(*fingerprint),
+        write,
+        *args,
+        user=user,
+        response_model=TaskResponse,
+        status_code=status_code,
+        **kwargs,
+    )
+
+
+def _replayed(replay: idempotency_service.Replay) -> Response:
+    headers = {"Idempotent-Replayed": "true"}
+    if replay.status_code < 400:
+        headers["ETag"] = _version_etag(replay.body["version"])
+    return JSONResponse(replay.body, status_code=replay.status_code, headers=headers)
+
+
+def _parse_if_match(if_match: str | None) -> int | None:
+    """Return the task version named by an If-Match header, or None when
+    the header is absent or ``*``"""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    try:
+        return int(if_match.strip().removeprefix("W/").strip('"'))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="If-Match must be a task ETag",
+        )
+
 
 @task_router.post("/", response_model=TaskResponse, status_code=status.HTTP_201_CREATED)
-def create(request: TaskCreate, db: DBSession, user: Current_User_Dependency):
+async def create(
+    request: TaskCreate,
+    db: DBSession,
+    user: Current_User_Dependency,
+    idempotency_key: str | None = _IDEMPOTENCY_KEY,
+):
+    """Create a task. Send an Idempotency-Key to make retries safe: a
+    repeated request gets the first one's response instead of a new task"""
     try:
-        task = task_service.create_task(request, db, user)
+        task = await _idempotent_write(
+            db,
+            user,
+            idempotency_key,
+            ("POST /api/tasks/", request.model_dump(mode="json")),
+            task_service.create_task,
+            request,
+            status_code=status.HTTP_201_CREATED,
+        )
     except DatabaseError:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="An error occurred while creating the task",
         )
+    if isinstance(task, idempotency_service.Replay):
+        return _replayed(task)
     return task
 
 
+# Batch routes are declared before /{id} so "batch" is never taken for an id.
+# Each runs as one transaction and reports a status per item.
+@task_router.post("/batch", response_model=TaskBatchResponse)
+async def create_batch(
+    request: TaskBatchCreate, db: DBSession, user: Current_User_Dependency
+):
+    try:
+        results = await run_db(task_service.create_tasks, db, request.items, user=user)
+    except DatabaseError:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while creating tasks",
+        )
+    return {"results": results}
+
+
+@task_router.patch("/batch", response_model=TaskBatchResponse)
+async def update_batch(
+    request: TaskBatchUpdate, db: DBSession, user: Current_User_Dependency
+):
+    try:
+        results = await run_db(task_service.update_tasks, db, request.items, user=user)
+    except DatabaseError:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while updating tasks",
+        )
+    return {"results": results}
+
+
+@task_router.delete("/batch", response_model=TaskBatchResponse)
+async def delete_batch(
+    request: TaskBatchDelete, db: DBSession, user: Current_User_Dependency
+):
+    try:
+        results = await run_db(task_service.delete_tasks, db, request.ids, user=user)
+    except DatabaseError:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while deleting tasks",
+        )
+    return {"results": results}
+
+
+@task_router.get("/stats", response_model=TaskStats)
+async def get_stats(db: DBSession, user: Current_User_Dependency, exact: bool = False):
+    """Dashboard counts, from counters kept up to date on every write.
+    ``exact=true`` counts the tasks instead"""
+    try:
+        stats = await run_db(task_service.fetch_task_stats, db, user=user, exact=exact)
+    except DatabaseError:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while fetching task stats",
+        )
+    return stats
+
+
+@task_router.get("/changes", response_model=TaskChangesResponse)
+async def get_changes(
+    db: DBSession, user: Current_User_Dependency, since: str | None = None
+):
+    """Delta sync: tasks created or updated and ids of tasks deleted since
+    the cursor returned by the previous call. Omit ``since`` for a full sync"""
+    try:
+        changes = await run_db(
+            task_service.fetch_task_changes, db, user=user, since=since
+        )
+    except DatabaseError:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while fetching task changes",
+        )
+    return changes
+
+
+@task_router.get("/stream")
+async def stream_changes(db: DBSession, token: str = Depends(event_stream_token)):
+    """Server-sent events: a ``changed`` event whenever the caller's tasks
+    change. One is also sent on connect; follow each with GET /changes.
+    When the token expires an ``expired`` event is sent and the stream
+    ends, so the client reconnects with a fresh token"""
+    user = await run_db(get_current_user, db, token=token)
+    expires_at = JWTHandler.decode_token(token)["exp"]
+    # Authentication is done; don't hold a pooled connection while idle
+    await release_db(db)
+    queue = task_events.subscribe(user.id)
+
+    async def events():
+        try:
+            yield "retry: 5000\n\nevent: changed\ndata: {}\n\n"
+            while (remaining := expires_at - time.time()) > 0:
+                try:
+                    async with asyncio.timeout(
+                        min(Config.STREAM_KEEPALIVE_SECONDS, remaining)
+                    ):
+                        await queue.get()
+                    yield "event: changed\ndata: {}\n\n"
+                except TimeoutError:
+                    # Keeps proxies from closing the idle connection
+                    yield ": keepalive\n\n"
+            yield "event: expired\ndata: {}\n\n"
+        finally:
+            task_events.unsubscribe(user.id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+_EXPORT_MEDIA_TYPES = {
+    TaskFileFormat.ndjson: "application/x-ndjson",
+    TaskFileFormat.csv: "text/csv",
+}
+
+
+# Export and import stream through a server-side cursor and COPY, which
+# need psycopg2, so they use their own sync session even with ASYNC_DB
+@task_router.get("/export")
+async def export_tasks(
+    db: DBSession,
+    user: Current_User_Dependency,
+    export_format: TaskFileFormat = Query(TaskFileFormat.ndjson, alias="format"),
+):
+    """Download all of the caller's tasks as NDJSON or CSV"""
+    await release_db(db)
+
+    def chunks():
+        export_db = SessionLocal()
+        try:
+            yield from task_service.export_tasks(export_db, user, export_format)
+        finally:
+            export_db.close()
+
+    return StreamingResponse(
+        chunks(),
+        media_type=_EXPORT_MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="tasks.{export_format.value}"'
+        },
+    )
+
+
+@task_router.post("/import", response_model=TaskImportResponse)
+async def import_tasks(
+    request: Request,
+    db: DBSession,
+    user: Current_User_Dependency,
+    import_format: TaskFileFormat = Query(TaskFileFormat.ndjson, alias="format"),
+):
+    """Bulk-create tasks from an NDJSON or CSV request body (the same
+    formats /export produces). The body is streamed, not buffered"""
+    await release_db(db)
+    body = request.stream()
+
+    async def next_chunk() -> bytes:
+        return await anext(body, b"")
+
+    def chunks():
+        # Runs on a worker thread; each chunk is awaited on the event loop
+        while chunk := from_thread.run(next_chunk):
+            yield chunk
+
+    def run_import():
+        import_db = SessionLocal()
+        try:
+            return task_service.import_tasks(
+                chunks(), import_db, user, import_format=import_format
+            )
+        finally:
+            import_db.close()
+
+    try:
+        result = await run_in_threadpool(run_import)
+    except DatabaseError:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while importing tasks",
+        )
+    return result
+
+
 @task_router.get("/", response_model=list[TaskResponse])
-def get_my_tasks(db: DBSession, user: Current_User_Dependency):
+async def get_my_tasks(
+    response: Response,
+    db: ReadDBSession,
+    user: Current_Reader_Dependency,
+    limit: int = Query(Config.TASKS_PAGE_SIZE, ge=1, le=Config.TASKS_MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    sort_by: TaskSortField = TaskSortField.created_at,
+    task_status: TaskStatus | None = Query(None, alias="status"),
+    due_from: date | None = None,
+    due_to: date | None = None,
+    title_prefix: str | None = Query(None, min_length=1),
+    if_none_match: str | None = Header(None),
+):
+    params = dict(
+        limit=limit,
+        cursor=cursor,
+        sort_by=sort_by,
+        task_status=task_status,
+        due_from=due_from,
+        due_to=due_to,
+        title_prefix=title_prefix,
+    )
     try:
-        tasks = task_service.fetch_my_tasks(db, user)
+        etag = await run_db(task_service.my_tasks_etag, db, user=user, **params)
+        if _etag_matches(if_none_match, etag):
+            return _not_modified(etag)
+        tasks, next_cursor = await run_db(
+            task_service.fetch_my_tasks,
+            db,
+            user=user,
+            as_rows=Config.FAST_JSON_RESPONSES,
+            **params,
+        )
     except DatabaseError:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="An error occurred while fetching tasks",
         )
+    # Pass the cursor back as ?cursor= to fetch the next page
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = _CACHE_CONTROL
+
+    if Config.FAST_JSON_RESPONSES:
+        # Returning a Response bypasses response_model, which still
+        # documents the body in OpenAPI
+        return Response(
+            dump_task_rows(tasks, user),  # type: ignore
+            media_type="application/json",
+            headers=dict(response.headers),
+        )
     return tasks
 
 
 @task_router.get("/{id}", response_model=TaskResponse)
-def get_task(id: str, db: DBSession, user: Current_User_Dependency):
+async def get_task(
+    id: str,
+    response: Response,
+    db: ReadDBSession,
+    user: Current_Reader_Dependency,
+    if_none_match: str | None = Header(None),
+):
     try:
-        task = task_service.fetch_task(id, db, user)
+        if if_none_match is not None:
+            version = await run_db(task_service.fetch_task_version, db, id, user=user)
+            etag = _version_etag(version)
+            if _etag_matches(if_none_match, etag):
+                return _not_modified(etag)
+        task = await run_db(task_service.fetch_task, db, id, user=user)
     except DatabaseError:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="An error occurred while fetching task",
         )
+    response.headers["ETag"] = _etag(task)
+    response.headers["Cache-Control"] = _CACHE_CONTROL
     return task
 
 
 @task_router.put("/{id}", response_model=TaskResponse | dict)
-def update(id: str, task: TaskUpdate, db: DBSession, user: Current_User_Dependency):
+async def update(
+    id: str,
+    task: TaskUpdate,
+    response: Response,
+    db: DBSession,
+    user: Current_User_Dependency,
+    if_match: str | None = Header(None),
+    idempotency_key: str | None = _IDEMPOTENCY_KEY,
+):
+    expected_version = _parse_if_match(if_match)
     try:
-        updated_task = task_service.update_task(id, task, db, user)
+        updated_task = await _idempotent_write(
+            db,
+            user,
+            idempotency_key,
+            ("PUT /api/tasks/{id}", id, task.model_dump(mode="json"), expected_version),
+            task_service.update_task,
+            id,
+            task,
+            expected_version=expected_version,
+        )
     except DatabaseError:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="An error occurred while updating task",
         )
+    if isinstance(updated_task, idempotency_service.Replay):
+        return _replayed(updated_task)
+    response.headers["ETag"] = _etag(updated_task)
     return updated_task
 
 
+@task_router.patch("/{id}", response_model=TaskResponse)
+async def patch(
+    id: str,
+    task: TaskPatch,
+    response: Response,
+    db: DBSession,
+    user: Current_User_Dependency,
+    if_match: str | None = Header(None),
+):
+    """Update only the fields present in the body. Send the task's ETag in
+    If-Match to get a 409 instead of overwriting a concurrent change"""
+    expected_version = _parse_if_match(if_match)
+    try:
+        patched_task = await run_db(
+            task_service.patch_task,
+            db,
+            id,
+            task,
+            user=user,
+            expected_version=expected_version,
+        )
+    except DatabaseError:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while updating task",
+        )
+    response.headers["ETag"] = _etag(patched_task)
+    return patched_task
+
+
 @task_router.delete("/{id}")
-def delete(id: str, db: DBSession, user: Current_User_Dependency):
+async def delete(id: str, db: DBSession, user: Current_User_Dependency):
     try:
-        task_service.delete_task(id, db, user)
+        await run_db(task_service.delete_task, db, id, user=user)
     except DatabaseError:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
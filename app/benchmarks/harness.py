@@ -0,0 +1,151 @@
+"""Shared plumbing for the load benchmarks: a real server process and
+load-generating client processes"""
+
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Awaitable, Callable
+
+import httpx
+
+APP_DIR = Path(__file__).resolve().parent.parent
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_healthy(base_url: str, server: subprocess.Popen, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode}")
+        try:
+            if httpx.get(f"{base_url}/health").json().get("status") == "ok":
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.05)
+    raise RuntimeError(f"Server not healthy within {timeout}s")
+
+
+@contextmanager
+def running_server(workers: int = 1, **env: str):
+    """Run ``python -m server`` on a free port and yield its base URL.
+    ``env`` overrides the environment the server inherits"""
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "server", "--workers", str(workers), "--port", str(port)],
+        cwd=APP_DIR,
+        env={**os.environ, "RUN_BACKGROUND_TASKS": "false", **env},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_healthy(base_url, server)
+        yield base_url
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait()
+
+
+# One request made by a load generator: wall-clock start (comparable across
+# processes), latency in seconds, status code (0 for a transport error) and
+# the server's X-Query-Count, if it sent one
+Sample = tuple[float, float, int, int | None]
+
+
+async def drive(
+    base_url: str,
+    step: Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]],
+    concurrency: int,
+    duration: float,
+    warmup: float = 0,
+) -> list[Sample]:
+    """Call ``step(client, loop_index)`` back to back from ``concurrency``
+    loops for ``warmup`` plus ``duration`` seconds, timing each call made
+    after the warm-up"""
+    samples: list[Sample] = []
+    measure_from = time.monotonic() + warmup
+    deadline = measure_from + duration
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+
+        async def loop(index: int):
+            while time.monotonic() < deadline:
+                measured = time.monotonic() >= measure_from
+                started_at = time.time()
+                start = time.perf_counter()
+                try:
+                    response = await step(client, index)
+                except httpx.HTTPError:
+                    if measured:
+                        samples.append((started_at, time.perf_counter() - start, 0, None))
+                    continue
+                if not measured:
+                    continue
+                queries = response.headers.get("X-Query-Count")
+                samples.append(
+                    (
+                        started_at,
+                        time.perf_counter() - start,
+                        response.status_code,
+                        int(queries) if queries is not None else None,
+                    )
+                )
+
+        await asyncio.gather(*(loop(index) for index in range(concurrency)))
+    return samples
+
+
+def run_clients(target: Callable[..., list[Sample]], client_args: list[tuple]) -> list[Sample]:
+    """Run ``target(*args)`` in one load generator process per entry of
+    ``client_args`` and merge their samples"""
+    # spawn: the caller may be running threads, which fork doesn't mix with
+    with ProcessPoolExecutor(
+        max_workers=len(client_args), mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        futures = [pool.submit(target, *args) for args in client_args]
+        return [sample for future in futures for sample in future.result()]
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return float("nan")
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def summarize(samples: list[Sample], duration: float) -> dict:
+    """Throughput, latency percentiles (successful requests only), status
+    counts and mean SQL statements per request"""
+    ok = sorted(latency for _, latency, status, _ in samples if 0 < status < 400)
+    statuses: dict[str, int] = {}
+    for _, _, status, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    queries = [count for *_, count in samples if count is not None]
+    return {
+        "requests": len(samples),
+        "errors": len(samples) - len(ok),
+        "requests_per_second": len(ok) / duration,
+        "latency_ms": {
+            "p50": percentile(ok, 0.50) * 1000,
+            "p95": percentile(ok, 0.95) * 1000,
+            "p99": percentile(ok, 0.99) * 1000,
+            "mean": (statistics.fmean(ok) if ok else float("nan")) * 1000,
+        },
+        "queries_per_request": statistics.fmean(queries) if queries else None,
+        "status_codes": statuses,
+    }
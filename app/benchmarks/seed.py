@@ -0,0 +1,154 @@
+"""Bulk test data for the load benchmarks
+
+Run from the app directory against a migrated database::
+
+    python -m benchmarks.seed [--users 200] [--tasks-per-user 50] [--expired 0.2]
+
+Rows are inserted straight into the database, many per statement, so a
+large data set takes seconds rather than the minutes the API would need.
+Every user shares one password hash, computed once. Usernames and emails
+start with a run id, which is how ``remove`` finds the rows again.
+"""
+
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+import argparse
+import random
+import uuid
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+from core.passwords import hash_password
+from models.task_model import Task, TaskCount, TaskStatus, TaskTombstone
+from models.user_model import User
+
+PASSWORD = "bench-password"
+_CHUNK = 5000  # rows per INSERT
+
+
+@dataclass(frozen=True)
+class SeededUser:
+    id: str
+    username: str
+    email: str
+
+
+def new_run_id() -> str:
+    return f"bench-{uuid.uuid4().hex[:8]}"
+
+
+def _task_rows(owner_id: str, count: int, expired_fraction: float, rng: random.Random):
+    today = date.today()
+    now = datetime.now()
+    for index in range(count):
+        if rng.random() < expired_fraction:
+            # Either kind of row the cleanup job deletes
+            if rng.random() < 0.5:
+                status, due_date = TaskStatus.done, today + timedelta(days=rng.randint(1, 30))
+            else:
+                status, due_date = TaskStatus.todo, today - timedelta(days=rng.randint(1, 30))
+        else:
+            status = rng.choice((TaskStatus.todo, TaskStatus.in_progress))
+            due_date = today + timedelta(days=rng.randint(1, 60))
+        created_at = now - timedelta(minutes=count - index)
+        yield {
+            "id": str(uuid.uuid4()),
+            "title": f"task {index}",
+            "description": "seeded by the benchmarks",
+            "status": status,
+            "due_date": due_date,
+            "owner_id": owner_id,
+            "created_at": created_at,
+            "updated_at": created_at,
+        }
+
+
+def seed(
+    db: Session,
+    run_id: str,
+    users: int,
+    tasks_per_user: int,
+    expired_fraction: float = 0.0,
+    random_seed: int = 0,
+) -> list[SeededUser]:
+    """Insert ``users`` users with ``tasks_per_user`` tasks each, of which
+    roughly ``expired_fraction`` are done or past due. Every user's
+    password is PASSWORD"""
+    rng = random.Random(random_seed)
+    hashed_password = hash_password(PASSWORD)
+    seeded = [
+        SeededUser(
+            id=str(uuid.uuid4()),
+            username=f"{run_id}-{index}",
+            email=f"{run_id}-{index}@bench.example.com",
+        )
+        for index in range(users)
+    ]
+    for start in range(0, users, _CHUNK):
+        db.execute(
+            insert(User),
+            [
+                {
+                    "id": user.id,
+                    "username": user.username,
+                    "email": user.email,
+                    "hashed_password": hashed_password,
+                }
+                for user in seeded[start : start + _CHUNK]
+            ],
+        )
+
+    rows: list[dict] = []
+    for user in seeded:
+        rows.extend(_task_rows(user.id, tasks_per_user, expired_fraction, rng))
+        if len(rows) >= _CHUNK:
+            db.execute(insert(Task), rows)
+            rows = []
+    if rows:
+        db.execute(insert(Task), rows)
+    db.commit()
+    return seeded
+
+
+def remove(db: Session, run_id: str) -> int:
+    """Delete the users of a run with their tasks, tombstones and counters.
+    Returns the number of users deleted"""
+    owner_ids = select(User.id).where(User.username.startswith(f"{run_id}-"))
+    db.execute(delete(Task).where(Task.owner_id.in_(owner_ids)))
+    db.execute(delete(TaskTombstone).where(TaskTombstone.owner_id.in_(owner_ids)))
+    db.execute(delete(TaskCount).where(TaskCount.owner_id.in_(owner_ids)))
+    deleted = db.execute(delete(User).where(User.id.in_(owner_ids))).rowcount
+    db.commit()
+    return deleted
+
+
+def main() -> None:
+    from core.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--tasks-per-user", type=int, default=50)
+    parser.add_argument(
+        "--expired", type=float, default=0.2, help="fraction of tasks done or past due"
+    )
+    parser.add_argument("--run-id", help="defaults to a new random id")
+    parser.add_argument(
+        "--remove", metavar="RUN_ID", help="delete a previous run's data instead"
+    )
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        if args.remove:
+            print(f"Removed {remove(db, args.remove)} users of {args.remove}")
+            return
+        run_id = args.run_id or new_run_id()
+        users = seed(db, run_id, args.users, args.tasks_per_user, args.expired)
+    print(
+        f"Seeded {run_id}: {len(users)} users with {args.tasks_per_user} tasks "
+        f"each, password {PASSWORD!r}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Task list serialization: response_model against dump_task_rows
+
+Run from the app directory::
+
+    python -m benchmarks.serialization [--tasks 10000] [--repeat 5]
+
+Both paths serialize the same in-memory tasks, so no database is needed.
+The first is what FastAPI does for ``response_model=list[TaskResponse]``,
+the second what ``GET /api/tasks/`` does with ``FAST_JSON_RESPONSES``.
+"""
+
+from datetime import date
+from uuid import uuid4
+import argparse
+import asyncio
+import json
+import time
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from models.task_model import Task, TaskStatus
+from models.user_model import User
+from schemas.task_schema import TaskResponse, dump_task_rows
+
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    owner = User(id=str(uuid4()), username="bench", email="bench@example.com")
+    tasks = [
+        Task(
+            id=str(uuid4()),
+            title=f"Task {i}",
+            description="Benchmark task" if i % 2 else None,
+            status=TaskStatus.in_progress,
+            due_date=date.today(),
+            version=1,
+            owner=owner,
+        )
+        for i in range(args.tasks)
+    ]
+    rows = [
+        (t.id, t.title, t.description, t.status, t.due_date, t.version)
+        for t in tasks
+    ]
+    field = create_model_field(
+        name="Response_get_my_tasks",
+        type_=list[TaskResponse],
+        mode="serialization",
+    )
+
+    def default_path() -> bytes:
+        content = asyncio.run(
+            serialize_response(field=field, response_content=tasks)
+        )
+        return JSONResponse(content).body
+
+    def fast_path() -> bytes:
+        return dump_task_rows(rows, owner)  # type: ignore
+
+    assert json.loads(default_path()) == json.loads(fast_path())
+
+    default_cost = best_of(default_path, args.repeat)
+    fast_cost = best_of(fast_path, args.repeat)
+    print(f"{args.tasks} tasks, response_model: {default_cost * 1e3:8.2f} ms")
+    print(f"{args.tasks} tasks, dump_task_rows: {fast_cost * 1e3:8.2f} ms")
+    print(f"speedup:                     {default_cost / fast_cost:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Cold-start benchmark: import time and time to first response
+
+Run from the app directory with the app's usual environment::
+
+    python -m benchmarks.startup [--runs 5] [--json]
+
+Every sample uses a fresh interpreter, as a scaled-to-zero instance would:
+
+* import: ``import main`` in a new process, plus where that time goes
+  per package according to ``python -X importtime``
+* first response: from launching uvicorn until ``GET /health`` answers
+  with a working database, so it includes the lifespan startup work
+"""
+
+from pathlib import Path
+import argparse
+import json
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+APP_DIR = Path(__file__).resolve().parent.parent
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import main; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def measure_import() -> float:
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        cwd=APP_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return float(result.stdout.split()[-1])
+
+
+def heaviest_imports(limit: int = 12) -> list[tuple[str, float]]:
+    """Import time of ``import main`` per top-level package, in seconds,
+    from the self times ``python -X importtime`` reports per module"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=APP_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    totals: dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_time, _, name = line.removeprefix("import time:").split("|")
+        if not self_time.strip().isdigit():
+            continue  # header
+        package = name.strip().split(".")[0]
+        totals[package] = totals.get(package, 0.0) + int(self_time) / 1_000_000
+    return sorted(totals.items(), key=lambda entry: entry[1], reverse=True)[:limit]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_first_response(timeout: float = 60.0) -> float:
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/health"
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port)],
+        cwd=APP_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            if server.poll() is not None:
+                raise RuntimeError(f"Server exited with code {server.returncode}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    body = json.load(response)
+                elapsed = time.perf_counter() - start
+                if body.get("status") != "ok":
+                    raise RuntimeError(f"Health check failed: {body}")
+                return elapsed
+            except OSError:
+                if time.perf_counter() - start > timeout:
+                    raise RuntimeError(f"No response within {timeout}s")
+                time.sleep(0.01)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def _summary(samples: list[float]) -> dict:
+    return {
+        "median": statistics.median(samples),
+        "min": min(samples),
+        "max": max(samples),
+        "samples": samples,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print JSON only")
+    args = parser.parse_args()
+
+    report = {
+        "import_seconds": _summary([measure_import() for _ in range(args.runs)]),
+        "first_response_seconds": _summary(
+            [measure_first_response() for _ in range(args.runs)]
+        ),
+        "heaviest_imports": dict(heaviest_imports()),
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    for label, key in (
+        ("import main", "import_seconds"),
+        ("first response", "first_response_seconds"),
+    ):
+        stats = report[key]
+        print(
+            f"{label:<16}{stats['median'] * 1000:8.0f} ms median "
+            f"(min {stats['min'] * 1000:.0f}, max {stats['max'] * 1000:.0f})"
+        )
+    print("\nImport time by package:")
+    for name, seconds in report["heaviest_imports"].items():
+        print(f"  {name:<40}{seconds * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
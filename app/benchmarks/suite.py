@@ -0,0 +1,408 @@
+"""Load-test suite: scripted scenarios against the real app
+
+Run from the app directory against a migrated database::
+
+    python -m benchmarks.suite [--scenarios login,polling,crud,cleanup]
+        [--duration 10] [--output results.json]
+        [--compare baseline.json [--tolerance 0.15]]
+
+Seeds users and tasks (see ``benchmarks.seed``), starts ``python -m server``
+with X-Query-Count enabled and worker recycling disabled, then runs each
+scenario from load-generating processes:
+
+* login: every client logs in over and over, rotating through the users,
+  so password hashing and the hashing pool's load shedding dominate
+* polling: each client polls its first page of tasks with If-None-Match,
+  as the web app does, so most responses are 304s
+* crud: a mix of 30% creates, 25% reads, 25% patches, 10% deletes and 10%
+  list pages on each client's own tasks
+* cleanup: the crud mix again while this process runs the expired-task
+  cleanup job over ``--cleanup-tasks`` freshly seeded expired tasks. The
+  headline numbers cover only the requests made while the job ran;
+  ``overall`` has the whole run. The job deletes every expired task in
+  the database, not just seeded ones, so don't point the suite at data you
+  care about.
+
+Results are printed and, with ``--output``, saved as JSON together with the
+commit and settings they were taken with. ``--compare`` checks the results
+against a saved file and exits with status 1 if a scenario lost more than
+``--tolerance`` of its throughput, got that much slower at p50 or p95, or
+runs more SQL statements per request. Only compare files taken with the
+same settings on the same machine.
+"""
+
+from datetime import datetime, timedelta, timezone
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+import httpx
+
+from .harness import APP_DIR, Sample, drive, run_clients, running_server, summarize
+
+SCENARIOS = ("login", "polling", "crud", "cleanup")
+
+CRUD_MIX = {"create": 30, "get": 25, "patch": 25, "delete": 10, "list": 10}
+
+# Load generators need about this long to start; they all begin together
+# once it has passed
+_CLIENT_START_SECONDS = 3
+
+# Queries per request don't depend on the machine, so they get a tight bound
+# of their own. Mixed scenarios still vary a little with how many of each
+# operation a run happened to make
+_QUERY_TOLERANCE = 0.05
+
+# Metrics compared with --tolerance, and which direction is an improvement
+_HIGHER_IS_BETTER = {"requests_per_second": True, "p50": False, "p95": False}
+
+
+def _headers(user: dict) -> dict:
+    return {"Authorization": f"Bearer {user['token']}"}
+
+
+def _login_step(users: list[dict]):
+    turn = itertools.count()
+
+    async def step(client: httpx.AsyncClient, index: int) -> httpx.Response:
+        user = users[next(turn) % len(users)]
+        return await client.post(
+            "/api/auth/login",
+            json={"email": user["email"], "password": user["password"]},
+        )
+
+    return step
+
+
+def _polling_step(users: list[dict]):
+    etags: dict[int, str] = {}
+
+    async def step(client: httpx.AsyncClient, index: int) -> httpx.Response:
+        headers = _headers(users[index % len(users)])
+        if index in etags:
+            headers["If-None-Match"] = etags[index]
+        response = await client.get("/api/tasks/", headers=headers)
+        if "ETag" in response.headers:
+            etags[index] = response.headers["ETag"]
+        return response
+
+    return step
+
+
+def _crud_step(users: list[dict]):
+    # Each loop only touches tasks it created itself
+    owned: dict[int, list[str]] = {}
+    rngs: dict[int, random.Random] = {}
+    operations, weights = list(CRUD_MIX), list(CRUD_MIX.values())
+
+    async def step(client: httpx.AsyncClient, index: int) -> httpx.Response:
+        headers = _headers(users[index % len(users)])
+        ids = owned.setdefault(index, [])
+        rng = rngs.setdefault(index, random.Random(index))
+        operation = rng.choices(operations, weights)[0]
+        if not ids and operation in ("get", "patch", "delete"):
+            operation = "create"
+
+        if operation == "create":
+            response = await client.post(
+                "/api/tasks/", json={"title": f"bench {uuid.uuid4().hex}"}, headers=headers
+            )
+            if response.status_code == 201:
+                ids.append(response.json()["id"])
+        elif operation == "get":
+            response = await client.get(f"/api/tasks/{rng.choice(ids)}", headers=headers)
+        elif operation == "patch":
+            response = await client.patch(
+                f"/api/tasks/{rng.choice(ids)}",
+                json={"status": rng.choice(("todo", "in_progress"))},
+                headers=headers,
+            )
+        elif operation == "delete":
+            task_id = ids.pop(rng.randrange(len(ids)))
+            response = await client.delete(f"/api/tasks/{task_id}", headers=headers)
+        else:
+            response = await client.get("/api/tasks/", headers=headers)
+        return response
+
+    return step
+
+
+_STEPS = {
+    "login": _login_step,
+    "polling": _polling_step,
+    "crud": _crud_step,
+    "cleanup": _crud_step,
+}
+
+
+def _client(
+    scenario: str,
+    base_url: str,
+    users: list[dict],
+    concurrency: int,
+    warmup: float,
+    duration: float,
+    start_at: float,
+) -> list[Sample]:
+    time.sleep(max(0.0, start_at - time.time()))
+    step = _STEPS[scenario](users)
+    return asyncio.run(drive(base_url, step, concurrency, duration, warmup))
+
+
+def _run_cleanup(delay: float, result: dict) -> None:
+    from core.database import SessionLocal
+    from services.task_service import delete_completed_or_due_tasks
+
+    time.sleep(max(0.0, delay))
+    result["started_at"] = time.time()
+    with SessionLocal() as db:
+        result["deleted"] = delete_completed_or_due_tasks(db)
+    result["finished_at"] = time.time()
+
+
+def run_scenario(
+    scenario: str, base_url: str, users: list[dict], run_id: str, args: argparse.Namespace
+) -> dict:
+    if scenario == "cleanup":
+        # Owned by separate users, so the load doesn't see them
+        from core.database import SessionLocal
+
+        from . import seed
+
+        with SessionLocal() as db:
+            seed.seed(
+                db,
+                f"{run_id}-expired",
+                users=max(1, args.cleanup_tasks // 1000),
+                tasks_per_user=min(args.cleanup_tasks, 1000),
+                expired_fraction=1.0,
+            )
+
+    start_at = time.time() + _CLIENT_START_SECONDS
+    per_client = max(1, args.concurrency // args.clients)
+    client_args = [
+        (
+            scenario,
+            base_url,
+            users[index :: args.clients],
+            per_client,
+            args.warmup,
+            args.duration,
+            start_at,
+        )
+        for index in range(args.clients)
+    ]
+
+    if scenario != "cleanup":
+        return summarize(run_clients(_client, client_args), args.duration)
+
+    # Start the job a quarter of the way into the measured run
+    cleanup: dict = {}
+    delay = start_at + args.warmup + args.duration / 4 - time.time()
+    job = threading.Thread(target=_run_cleanup, args=(delay, cleanup))
+    job.start()
+    samples = run_clients(_client, client_args)
+    job.join()
+
+    started, finished = cleanup["started_at"], cleanup["finished_at"]
+    # The job may outlast the load
+    window_end = min(finished, start_at + args.warmup + args.duration)
+    during = [sample for sample in samples if started <= sample[0] < window_end]
+    return {
+        **summarize(during, window_end - started),
+        "cleanup": {"deleted": cleanup["deleted"], "seconds": finished - started},
+        "overall": summarize(samples, args.duration),
+    }
+
+
+def _git(*args: str) -> str | None:
+    try:
+        return subprocess.run(
+            ["git", *args], cwd=APP_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _meta(args: argparse.Namespace) -> dict:
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain")),
+        "taken_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "settings": {
+            name: getattr(args, name)
+            for name in (
+                "workers",
+                "duration",
+                "warmup",
+                "concurrency",
+                "clients",
+                "users",
+                "tasks_per_user",
+                "expired",
+                "cleanup_tasks",
+            )
+        },
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Regressions of ``results`` against ``baseline``, as messages"""
+    regressions = []
+    for scenario, current in results["scenarios"].items():
+        previous = baseline["scenarios"].get(scenario)
+        if previous is None:
+            continue
+        values = {
+            "requests_per_second": (
+                previous["requests_per_second"],
+                current["requests_per_second"],
+            ),
+            "p50": (previous["latency_ms"]["p50"], current["latency_ms"]["p50"]),
+            "p95": (previous["latency_ms"]["p95"], current["latency_ms"]["p95"]),
+        }
+        for metric, (before, after) in values.items():
+            if not before or before != before:  # zero or NaN
+                continue
+            change = (after - before) / before
+            worse = -change if _HIGHER_IS_BETTER[metric] else change
+            if worse > tolerance:
+                regressions.append(
+                    f"{scenario}: {metric} {before:.1f} -> {after:.1f} ({change:+.0%})"
+                )
+        before, after = previous["queries_per_request"], current["queries_per_request"]
+        if before and after is not None and after > before * (1 + _QUERY_TOLERANCE):
+            regressions.append(
+                f"{scenario}: queries_per_request {before:.2f} -> {after:.2f}"
+            )
+    return regressions
+
+
+def _print_report(results: dict) -> None:
+    print(
+        f"{'scenario':<10}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+        f"{'queries':>9}{'errors':>8}"
+    )
+    for scenario, result in results["scenarios"].items():
+        latency = result["latency_ms"]
+        queries = result["queries_per_request"]
+        print(
+            f"{scenario:<10}{result['requests_per_second']:>9.0f}"
+            f"{latency['p50']:>9.1f}{latency['p95']:>9.1f}{latency['p99']:>9.1f}"
+            f"{queries if queries is not None else float('nan'):>9.2f}"
+            f"{result['errors']:>8}"
+        )
+    if "cleanup" in results["scenarios"]:
+        cleanup = results["scenarios"]["cleanup"]["cleanup"]
+        print(
+            f"\ncleanup deleted {cleanup['deleted']} tasks in "
+            f"{cleanup['seconds']:.1f}s; its row covers requests made meanwhile"
+        )
+
+
+def main() -> None:
+    from server import default_workers
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--scenarios", default=",".join(SCENARIOS), help="comma-separated, run in order"
+    )
+    parser.add_argument("--workers", type=int, default=default_workers())
+    parser.add_argument("--duration", type=float, default=10, help="seconds measured")
+    parser.add_argument(
+        "--warmup", type=float, default=2, help="seconds of load before measuring"
+    )
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument(
+        "--clients", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+        help="load generator processes",
+    )
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--tasks-per-user", type=int, default=50)
+    parser.add_argument(
+        "--expired", type=float, default=0.2, help="fraction of seeded tasks expired"
+    )
+    parser.add_argument(
+        "--cleanup-tasks", type=int, default=50000,
+        help="expired tasks seeded for the cleanup scenario",
+    )
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="results JSON to check against")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    parser.add_argument(
+        "--keep-data", action="store_true", help="leave the seeded users and tasks"
+    )
+    args = parser.parse_args()
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    from core.database import SessionLocal
+    from core.security import JWTHandler
+
+    from . import seed
+
+    run_id = seed.new_run_id()
+    with SessionLocal() as db:
+        seeded = seed.seed(db, run_id, args.users, args.tasks_per_user, args.expired)
+    # Tokens are minted here rather than by logging in, so only the login
+    # scenario pays for password hashing
+    lifetime = timedelta(seconds=len(scenarios) * (args.duration + args.warmup) + 600)
+    users = [
+        {
+            "email": user.email,
+            "password": seed.PASSWORD,
+            "token": JWTHandler.encode_data(
+                {"sub": user.username, "user_id": user.id}, expires_in=lifetime
+            ),
+        }
+        for user in seeded
+    ]
+
+    results = {"meta": _meta(args), "scenarios": {}}
+    try:
+        with running_server(
+            args.workers, QUERY_BUDGET_CHECKS="true", MAX_REQUESTS="0"
+        ) as base_url:
+            for scenario in scenarios:
+                print(f"Running {scenario}...", file=sys.stderr)
+                results["scenarios"][scenario] = run_scenario(
+                    scenario, base_url, users, run_id, args
+                )
+    finally:
+        if not args.keep_data:
+            with SessionLocal() as db:
+                seed.remove(db, run_id)
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+    _print_report(results)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(results, baseline, args.tolerance)
+        commit = (baseline["meta"].get("commit") or "unknown")[:12]
+        if regressions:
+            print(f"\nRegressions against {commit}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nNo regressions against {commit} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""Token decoding: decode_token with a cold and a warm token cache
+
+Run from the app directory with the app's usual environment::
+
+    python -m benchmarks.tokens [--runs 20000]
+
+Cold clears the cache before every decode, so it pays for the JWT
+signature check each time; warm is served from the cache.
+"""
+
+import argparse
+import timeit
+
+from core.security import JWTHandler, token_cache
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20000)
+    args = parser.parse_args()
+
+    token = JWTHandler.encode_data({"sub": "bench", "user_id": "bench"})
+
+    def cold():
+        token_cache.clear()
+        JWTHandler.decode_token(token)
+
+    def warm():
+        JWTHandler.decode_token(token)
+
+    cold_cost = min(timeit.repeat(cold, number=args.runs, repeat=3)) / args.runs
+    warm_cost = min(timeit.repeat(warm, number=args.runs, repeat=3)) / args.runs
+    print(f"decode_token cold: {cold_cost * 1e6:8.2f} us/op")
+    print(f"decode_token warm: {warm_cost * 1e6:8.2f} us/op")
+    print(f"speedup:           {cold_cost / warm_cost:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Load test comparing one server worker with several
+
+Run from the app directory against a migrated database::
+
+    python -m benchmarks.workers [--workers N] [--duration 10] [--json]
+
+Starts ``python -m server`` with one worker and then with N (by default
+what the launcher would pick, and at least 2). Each run gets a fresh user
+with a page of tasks, and load-generating processes poll
+``GET /api/tasks/`` for ``--duration`` seconds. The report gives
+throughput and latency percentiles for each run. Only compare numbers
+taken on the same machine: the load generators share its CPUs with the
+server.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import uuid
+
+import httpx
+
+from .harness import Sample, drive, run_clients, running_server, summarize
+
+
+def _seed_user(base_url: str, tasks: int = 20) -> str:
+    """Register a user with a page of tasks and return their access token"""
+    name = f"bench{uuid.uuid4().hex[:10]}"
+    credentials = {"email": f"{name}@example.com", "password": "bench-password"}
+    with httpx.Client(base_url=base_url, timeout=30) as client:
+        client.post("/api/auth/register", json={"username": name, **credentials})
+        token = client.post("/api/auth/login", json=credentials).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        for index in range(tasks):
+            client.post("/api/tasks/", json={"title": f"task {index}"}, headers=headers)
+    return token
+
+
+def _poll_tasks(
+    base_url: str, token: str, concurrency: int, duration: float
+) -> list[Sample]:
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async def step(client: httpx.AsyncClient, index: int) -> httpx.Response:
+        return await client.get("/api/tasks/", headers=headers)
+
+    return asyncio.run(drive(base_url, step, concurrency, duration))
+
+
+def measure(workers: int, duration: float, concurrency: int, clients: int) -> dict:
+    with running_server(workers) as base_url:
+        token = _seed_user(base_url)
+        per_client = max(1, concurrency // clients)
+        samples = run_clients(
+            _poll_tasks, [(base_url, token, per_client, duration)] * clients
+        )
+    return {"workers": workers, **summarize(samples, duration)}
+
+
+def main() -> None:
+    from server import default_workers
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=max(2, default_workers()))
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument(
+        "--clients", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+        help="load generator processes",
+    )
+    parser.add_argument("--json", action="store_true", help="print JSON only")
+    args = parser.parse_args()
+
+    runs = [
+        measure(workers, args.duration, args.concurrency, args.clients)
+        for workers in (1, args.workers)
+    ]
+    if args.json:
+        print(json.dumps(runs, indent=2))
+        return
+
+    print(f"{'workers':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for run in runs:
+        latency = run["latency_ms"]
+        print(
+            f"{run['workers']:>8}{run['requests_per_second']:>10.0f}"
+            f"{latency['p50']:>10.1f}{latency['p95']:>10.1f}{latency['p99']:>10.1f}"
+            f"{run['errors']:>8}"
+        )
+    speedup = runs[1]["requests_per_second"] / max(runs[0]["requests_per_second"], 1e-9)
+    print(f"\n{args.workers} workers: {speedup:.2f}x the throughput of 1")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,9 +7,173 @@ load_dotenv()
 class Config:
     SECRET_KEY = os.getenv("SECRET_KEY")
     DATABASE_URL = os.getenv("DATABASE_URL")
+    # Create missing tables at startup instead of relying on
+    # `alembic upgrade head`. Convenient for a throwaway local database;
+    # every boot then pays for the reflection queries
+    DB_CREATE_ALL = os.getenv("DB_CREATE_ALL", "false").lower() == "true"
+    # Direct (non-pgbouncer) connection for session-level features: LISTEN,
+    # advisory locks and migrations. Defaults to DATABASE_URL
+    DATABASE_DIRECT_URL = os.getenv("DATABASE_DIRECT_URL") or DATABASE_URL
     TOKEN_EXPIRE_MINUTES = int(os.getenv("TOKEN_EXPIRE_MINUTES", "15"))
+    # Verified JWT claims memoized in-process until each token expires
+    TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
     ENVIRONMENT = os.getenv("ENVIRONMENT", "production")
 
+    # Serve requests with asyncpg/AsyncSession instead of psycopg2 sessions
+    # in the threadpool
+    ASYNC_DB = os.getenv("ASYNC_DB", "false").lower() == "true"
+
+    # Connection pooling. "queue" keeps DB_POOL_SIZE connections per worker;
+    # "none" opens a connection per request. DB_PGBOUNCER makes asyncpg
+    # safe behind pgbouncer's transaction pooling (no named prepared
+    # statements that outlive a transaction)
+    DB_POOLING = os.getenv("DB_POOLING", "queue").lower()
+    DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "false").lower() == "true"
+    # Worker processes sharing DB_MAX_CONNECTIONS (set by `python -m
+    # server`), and the threads serving sync routes in each. A worker can't
+    # use more connections than it has threads, so the default pool size is
+    # the smaller of the two shares
+    WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+    THREADPOOL_SIZE = int(
+        os.getenv("THREADPOOL_SIZE", str(max(8, 40 // WEB_CONCURRENCY)))
+    )
+    # Only the instance holding the leader lock runs background jobs
+    RUN_BACKGROUND_TASKS = os.getenv("RUN_BACKGROUND_TASKS", "true").lower() == "true"
+    DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "15"))
+    # Besides its pool, each worker holds a LISTEN connection (core.events)
+    # and, when it runs background tasks, one for the leader lock
+    # (core.leader). Both come out of its share
+    DB_SESSION_CONNECTIONS = 1 + RUN_BACKGROUND_TASKS
+    DB_POOL_SIZE = int(
+        os.getenv(
+            "DB_POOL_SIZE",
+            str(
+                max(
+                    1,
+                    min(
+                        THREADPOOL_SIZE,
+                        DB_MAX_CONNECTIONS // WEB_CONCURRENCY - DB_SESSION_CONNECTIONS,
+                    ),
+                )
+            ),
+        )
+    )
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "0"))
+    # Connections opened at startup so the first requests don't pay for them
+    DB_POOL_PREWARM = int(os.getenv("DB_POOL_PREWARM", str(DB_POOL_SIZE)))
+    # Requests waiting longer than this for a pooled connection get a 503
+    DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "1"))
+    # Connections idle for longer are pinged before use (0 pings every time)
+    DB_PING_IDLE_SECONDS = float(os.getenv("DB_PING_IDLE_SECONDS", "30"))
+    DB_CONNECT_TIMEOUT_SECONDS = int(os.getenv("DB_CONNECT_TIMEOUT_SECONDS", "10"))
+
+    # Read replicas (comma-separated URLs) for read-only routes. A replica
+    # is skipped while its replay lag exceeds REPLICA_MAX_LAG_SECONDS, and a
+    # user who wrote in the last READ_YOUR_WRITES_SECONDS reads from the
+    # primary so they see their own changes
+    DATABASE_REPLICA_URLS = [
+        url.strip()
+        for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",")
+        if url.strip()
+    ]
+    REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+    REPLICA_CHECK_INTERVAL_SECONDS = float(
+        os.getenv("REPLICA_CHECK_INTERVAL_SECONDS", "1")
+    )
+    READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "10"))
+
+    # Password hashing. New hashes use PASSWORD_HASHER; hashes made with the
+    # other algorithm or older cost settings are upgraded on login.
+    # Argon2 defaults follow the OWASP minimum (19 MiB, t=2, p=1).
+    PASSWORD_HASHER = os.getenv("PASSWORD_HASHER", "argon2")
+    ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "2"))
+    ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", "19456"))
+    ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "1"))
+    BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    # Size of the hashing process pool (0 hashes on a single thread instead)
+    # and how many hashes may be running or queued before /login and
+    # /register answer 503. By default half the host's CPUs, divided
+    # between the workers; a worker whose share rounds down to 0 hashes on
+    # one thread of its own
+    PASSWORD_HASH_WORKERS = int(
+        os.getenv(
+            "PASSWORD_HASH_WORKERS",
+            str(max(1, (os.cpu_count() or 2) // 2) // WEB_CONCURRENCY),
+        )
+    )
+    PASSWORD_HASH_QUEUE_LIMIT = int(
+        os.getenv("PASSWORD_HASH_QUEUE_LIMIT", str(max(1, PASSWORD_HASH_WORKERS) * 8))
+    )
+
+    # Authenticated users cached in-process by get_current_user
+    USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+    USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+
+    # Task listing
+    TASKS_PAGE_SIZE = int(os.getenv("TASKS_PAGE_SIZE", "50"))
+    TASKS_MAX_PAGE_SIZE = int(os.getenv("TASKS_MAX_PAGE_SIZE", "200"))
+    # Items accepted by one /api/tasks/batch request
+    TASKS_MAX_BATCH_SIZE = int(os.getenv("TASKS_MAX_BATCH_SIZE", "1000"))
+    # Serialize task lists straight from query rows, skipping response
+    # model validation
+    FAST_JSON_RESPONSES = (
+        os.getenv("FAST_JSON_RESPONSES", "false").lower() == "true"
+    )
+    # Export/import: rows fetched per server-side cursor round trip, and the
+    # most tasks one import may load
+    TASKS_EXPORT_BATCH_SIZE = int(os.getenv("TASKS_EXPORT_BATCH_SIZE", "1000"))
+    TASKS_MAX_IMPORT_ROWS = int(os.getenv("TASKS_MAX_IMPORT_ROWS", "100000"))
+
+    # Worker recycling and shutdown in `python -m server`: each worker
+    # restarts after MAX_REQUESTS plus up to MAX_REQUESTS_JITTER requests
+    # (0 disables), so they don't all restart at once
+    MAX_REQUESTS = int(os.getenv("MAX_REQUESTS", "10000"))
+    MAX_REQUESTS_JITTER = int(os.getenv("MAX_REQUESTS_JITTER", "1000"))
+    GRACEFUL_TIMEOUT_SECONDS = float(os.getenv("GRACEFUL_TIMEOUT_SECONDS", "30"))
+
+    # Expired task cleanup
+    CLEANUP_INTERVAL_SECONDS = float(os.getenv("CLEANUP_INTERVAL_SECONDS", "3600"))
+    CLEANUP_JITTER_SECONDS = float(os.getenv("CLEANUP_JITTER_SECONDS", "300"))
+    CLEANUP_MAX_RUNTIME_SECONDS = float(os.getenv("CLEANUP_MAX_RUNTIME_SECONDS", "600"))
+    LEADER_RENEW_INTERVAL_SECONDS = float(
+        os.getenv("LEADER_RENEW_INTERVAL_SECONDS", "15")
+    )
+    CLEANUP_BATCH_SIZE = int(os.getenv("CLEANUP_BATCH_SIZE", "1000"))
+    CLEANUP_BATCH_PAUSE_SECONDS = float(os.getenv("CLEANUP_BATCH_PAUSE_SECONDS", "0.1"))
+
+    # Delta sync: how long deletions are remembered. Older sync cursors get
+    # 410 Gone and have to start over with a full sync
+    TOMBSTONE_RETENTION_DAYS = int(os.getenv("TOMBSTONE_RETENTION_DAYS", "30"))
+
+    # How long responses to writes sent with an Idempotency-Key are kept
+    # for retries of the same request
+    IDEMPOTENCY_KEY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24"))
+
+    # Seconds between keepalive comments on idle /api/tasks/stream responses
+    STREAM_KEEPALIVE_SECONDS = float(os.getenv("STREAM_KEEPALIVE_SECONDS", "15"))
+
+    # Expose Prometheus metrics at /metrics
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    # Directory where worker processes pool their metrics so any of them
+    # can answer a scrape for all (set by `python -m server`), and how often
+    # each writes its samples there
+    METRICS_DIR = os.getenv("METRICS_DIR") or None
+    METRICS_SNAPSHOT_INTERVAL_SECONDS = float(
+        os.getenv("METRICS_SNAPSHOT_INTERVAL_SECONDS", "5")
+    )
+
+    # Report database connection wait/setup time in a Server-Timing header
+    SERVER_TIMING = (
+        os.getenv("SERVER_TIMING", str(ENVIRONMENT == "development")).lower()
+        == "true"
+    )
+
+    # Log routes that run more SQL statements than their budget allows
+    QUERY_BUDGET_CHECKS = (
+        os.getenv("QUERY_BUDGET_CHECKS", str(ENVIRONMENT == "development")).lower()
+        == "true"
+    )
+
     @classmethod
     def validate_config(cls):
         """Validate that required environment variables are set"""
@@ -23,3 +187,10 @@ class Config:
             raise ValueError(
                 "DATABASE_URL must be a valid PostgreSQL connection string"
             )
+        if cls.DB_POOLING not in ("queue", "none"):
+            raise ValueError('DB_POOLING must be "queue" or "none"')
+        for url in cls.DATABASE_REPLICA_URLS:
+            if not url.startswith(("postgresql://", "postgres://")):
+                raise ValueError(
+                    "DATABASE_REPLICA_URLS must be PostgreSQL connection strings"
+                )
@@ -1,38 +1,262 @@
-from sqlalchemy import create_engine
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable
+from uuid import uuid4
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, event, make_url
+from sqlalchemy.exc import DisconnectionError, IntegrityError
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import NullPool, QueuePool
-import os
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+import asyncio
+import logging
+import time
 
 from .config import Config
+from .metrics import DB_CONNECT, DB_POOL_WAIT, Gauge, record_timing
 
-# Use NullPool for better compatibility with serverless/Render environments
-# Use QueuePool for local development
-pool_class = NullPool if os.getenv("RENDER") == "true" else QueuePool
+logger = logging.getLogger(__name__)
+
+
+def _timed_pool(base):
+    """Subclass a pool so every checkout records how long it took to get a
+    usable connection, including any ping or reconnect. It also goes into
+    the request's Server-Timing header as db-pool.
+    Subclassing (rather than patching an instance) survives pool.recreate()"""
+
+    class TimedPool(base):
+        def connect(self):
+            start = time.perf_counter()
+            try:
+                return super().connect()
+            finally:
+                elapsed = time.perf_counter() - start
+                DB_POOL_WAIT.observe(elapsed)
+                record_timing("db-pool", elapsed)
+
+    TimedPool.__name__ = f"Timed{base.__name__}"
+    return TimedPool
+
+
+# DB_POOLING=none opens a connection per checkout, for platforms that
+# freeze idle instances
+pooled = Config.DB_POOLING == "queue"
+pool_class = _timed_pool(QueuePool if pooled else NullPool)
+async_pool_class = _timed_pool(AsyncAdaptedQueuePool if pooled else NullPool)
 
-# Configure engine with retry logic for better Render compatibility
 engine_config = {
     "url": Config.DATABASE_URL,  # type: ignore
     "poolclass": pool_class,
-    "pool_pre_ping": True,  # Verify connections before using them
     "echo": False,
-    "connect_args": {"connect_timeout": 30, "application_name": "task-flow-api"},
+    "connect_args": {
+        "connect_timeout": Config.DB_CONNECT_TIMEOUT_SECONDS,
+        "application_name": "task-flow-api",
+    },
 }
 
-# Add connection pooling settings for production
-if not os.getenv("RENDER") == "true":
+if pooled:
     engine_config.update(
         {
-            "pool_size": 5,
-            "max_overflow": 10,
-            "pool_timeout": 30,
+            "pool_size": Config.DB_POOL_SIZE,
+            "max_overflow": Config.DB_MAX_OVERFLOW,
+            # Short on purpose: a saturated pool answers 503 (see main.py)
+            # instead of holding the request for the default 30s
+            "pool_timeout": Config.DB_POOL_TIMEOUT_SECONDS,
             "pool_recycle": 3600,
         }
     )
 
 engine = create_engine(**engine_config)
 
+
+def _async_engine_config(database_url: str = Config.DATABASE_URL) -> dict:  # type: ignore
+    """Derive the asyncpg engine settings from engine_config
+
+    asyncpg takes ``timeout``/``server_settings`` instead of libpq's
+    connect_timeout/application_name, and ``ssl`` instead of ``sslmode``.
+    """
+    url = make_url(database_url.replace("postgres://", "postgresql://", 1))
+    connect_args: dict[str, Any] = {
+        "timeout": Config.DB_CONNECT_TIMEOUT_SECONDS,
+        "server_settings": {"application_name": "task-flow-api"},
+    }
+    sslmode = url.query.get("sslmode")
+    if sslmode:
+        url = url.difference_update_query(["sslmode"])
+        connect_args["ssl"] = sslmode
+    if Config.DB_PGBOUNCER:
+        # Under transaction pooling each transaction may land on a different
+        # server connection, so prepared statements can't be cached or
+        # reused by name across transactions
+        connect_args.update(
+            {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+            }
+        )
+
+    config = {
+        **engine_config,
+        "url": url.set(drivername="postgresql+asyncpg"),
+        "poolclass": async_pool_class,
+        "connect_args": connect_args,
+    }
+    return config
+
+
+# Opt-in async request path (ASYNC_DB=true), alongside the sync engine that
+# background jobs and the sync request path keep using
+async_engine = create_async_engine(**_async_engine_config()) if Config.ASYNC_DB else None
+
+
+def _pool_stat(name: str):
+    # NullPool keeps no connections, so it has no checkedout()/overflow()
+    def read():
+        pool = async_engine.pool if async_engine else engine.pool
+        stat = getattr(pool, name, None)
+        # QueuePool.overflow() counts up from -pool_size
+        return max(stat(), 0) if stat else None
+
+    return read
+
+
+Gauge(
+    "db_pool_checked_out",
+    "Connections currently checked out of the pool",
+    _pool_stat("checkedout"),
+)
+Gauge(
+    "db_pool_overflow",
+    "Connections open beyond pool_size",
+    _pool_stat("overflow"),
+)
+
+# Per-request SQL statement counter, see count_queries()
+_query_counter: ContextVar[list[int] | None] = ContextVar("query_counter", default=None)
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    counter = _query_counter.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+event.listen(engine, "before_cursor_execute", _count_query)
+if async_engine:
+    event.listen(async_engine.sync_engine, "before_cursor_execute", _count_query)
+
+
+def watch_connections(engine: Any) -> None:
+    """Time every new connection (db-connect in Server-Timing, part of
+    db-pool) and, when pooling, ping connections before use only once they
+    have sat idle for DB_PING_IDLE_SECONDS, rather than pool_pre_ping's
+    round trip on every checkout. A failed ping makes the pool reconnect."""
+    target = engine.sync_engine if isinstance(engine, AsyncEngine) else engine
+    dialect = target.dialect
+
+    @event.listens_for(target, "do_connect")
+    def start_connect(dialect, record, cargs, cparams):
+        record.info["connect_started"] = time.perf_counter()
+
+    @event.listens_for(target, "connect")
+    def end_connect(dbapi_connection, record):
+        started = record.info.pop("connect_started", None)
+        if started is not None:
+            elapsed = time.perf_counter() - started
+            DB_CONNECT.observe(elapsed)
+            record_timing("db-connect", elapsed)
+
+    if not pooled:
+        return
+
+    @event.listens_for(target, "checkin")
+    def mark_idle(dbapi_connection, record):
+        record.info["idle_since"] = time.monotonic()
+
+    @event.listens_for(target, "checkout")
+    def ping_if_idle(dbapi_connection, record, proxy):
+        idle_since = record.info.pop("idle_since", None)
+        if idle_since is None:
+            return  # just opened
+        if time.monotonic() - idle_since < Config.DB_PING_IDLE_SECONDS:
+            return
+        try:
+            dialect.do_ping(dbapi_connection)
+        except Exception as e:
+            raise DisconnectionError(f"Idle connection failed its ping: {e}") from e
+
+
+watch_connections(engine)
+if async_engine:
+    watch_connections(async_engine)
+
+
+async def prewarm_pool(size: int = Config.DB_POOL_PREWARM) -> int:
+    """Open up to ``size`` connections at once on the engine that serves
+    requests and check them back in, so early requests find them ready.
+    Returns how many were opened"""
+    size = min(size, Config.DB_POOL_SIZE) if pooled else 0
+    if size <= 0:
+        return 0
+
+    if async_engine:
+
+        async def open_async():
+            return await async_engine.connect()  # type: ignore
+
+        results = await asyncio.gather(
+            *(open_async() for _ in range(size)), return_exceptions=True
+        )
+    else:
+        results = await asyncio.gather(
+            *(asyncio.to_thread(engine.connect) for _ in range(size)),
+            return_exceptions=True,
+        )
+
+    opened = [conn for conn in results if not isinstance(conn, BaseException)]
+    for conn in opened:
+        if async_engine:
+            await conn.close()
+        else:
+            await asyncio.to_thread(conn.close)
+    if len(opened) < size:
+        error = next(r for r in results if isinstance(r, BaseException))
+        logger.warning(f"Pre-warmed {len(opened)}/{size} connections: {error}")
+    return len(opened)
+
+
+@contextmanager
+def count_queries():
+    """Count SQL statements executed in the current context
+
+    The yielded single-item list holds the running count. Sync routes and
+    dependencies run in copies of the request context, so they all add to
+    the same counter.
+    """
+    counter = [0]
+    token = _query_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _query_counter.reset(token)
+
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False: nothing may lazy-load once results leave the session
+AsyncSessionLocal = (
+    async_sessionmaker(
+        async_engine, autoflush=False, expire_on_commit=False, class_=AsyncSession
+    )
+    if async_engine
+    else None
+)
 Base = declarative_base()
 
 
@@ -42,3 +266,39 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def release_db(db: Session | AsyncSession) -> None:
+    """Return a request's connection to the pool early, e.g. before a
+    long-lived streaming response"""
+    if isinstance(db, AsyncSession):
+        await db.close()
+    else:
+        await run_in_threadpool(db.close)
+
+
+def violated_constraint(error: IntegrityError) -> str | None:
+    """Name of the constraint behind an IntegrityError, for either driver"""
+    # psycopg2 exposes it on .diag; asyncpg on the wrapped driver exception
+    diag = getattr(error.orig, "diag", None)
+    if diag is not None:
+        return diag.constraint_name
+    return getattr(error.orig.__cause__, "constraint_name", None)
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:  # type: ignore
+        yield db
+
+
+async def run_db(fn: Callable, db: Session | AsyncSession, *args, **kwargs):
+    """Call a sync service function ``fn(*args, db=..., **kwargs)`` without
+    blocking the event loop
+
+    With an AsyncSession the function runs through ``run_sync``, so the ORM
+    code is shared while every round trip is awaited on asyncpg. With a
+    plain Session it runs in the threadpool, as a sync route would.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(lambda session: fn(*args, db=session, **kwargs))
+    return await run_in_threadpool(fn, *args, db=db, **kwargs)
@@ -0,0 +1,136 @@
+"""Per-owner task change notifications over Postgres LISTEN/NOTIFY
+
+Writes in ``task_service`` call ``pg_notify(TASK_CHANNEL, owner_id)``, which
+Postgres delivers when the transaction commits (identical notifications in
+one transaction are sent once). Each worker keeps a single listening
+connection and fans notifications out to its in-process subscribers, so
+streaming clients hold no database connection of their own.
+
+Events carry no data: they tell a client that its tasks changed, and the
+client fetches the details from ``/api/tasks/changes``.
+"""
+
+from collections import defaultdict
+import asyncio
+import logging
+
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+
+from .config import Config
+from .leader import KEEPALIVE_ARGS
+from .metrics import Gauge
+
+logger = logging.getLogger(__name__)
+
+TASK_CHANNEL = "task_changes"
+
+
+class TaskEvents:
+    def __init__(self, channel: str = TASK_CHANNEL, retry_interval: float = 5):
+        self.channel = channel
+        self.retry_interval = retry_interval
+        self._subscribers: dict[str, set[asyncio.Queue]] = defaultdict(set)
+        self._engine = None
+        self._conn = None
+        self._lost: asyncio.Event | None = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    def subscribe(self, owner_id: str) -> asyncio.Queue:
+        # One slot is enough: a pending event already says "something changed"
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self._subscribers[owner_id].add(queue)
+        return queue
+
+    def unsubscribe(self, owner_id: str, queue: asyncio.Queue) -> None:
+        queues = self._subscribers.get(owner_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[owner_id]
+
+    def _dispatch(self, owner_id: str) -> None:
+        for queue in self._subscribers.get(owner_id, ()):
+            if queue.empty():
+                queue.put_nowait(None)
+
+    def _dispatch_all(self) -> None:
+        for owner_id in list(self._subscribers):
+            self._dispatch(owner_id)
+
+    def _connect(self) -> None:
+        """Open the listening connection. Blocking"""
+        if self._engine is None:
+            self._engine = create_engine(
+                Config.DATABASE_DIRECT_URL,  # type: ignore
+                poolclass=NullPool,
+                connect_args={
+                    "connect_timeout": 10,
+                    "application_name": "task-flow-events",
+                    **KEEPALIVE_ARGS,
+                },
+            )
+        # Keep the pool's proxy: NullPool closes the connection once it's dropped
+        self._conn = self._engine.raw_connection()
+        driver_conn = self._conn.driver_connection
+        driver_conn.autocommit = True
+        with driver_conn.cursor() as cursor:
+            cursor.execute(f'LISTEN "{self.channel}"')
+
+    def _on_readable(self) -> None:
+        driver_conn = self._conn.driver_connection  # type: ignore
+        try:
+            driver_conn.poll()
+        except Exception as e:
+            logger.warning(f"Task event listener lost its connection: {e}")
+            self._lost.set()  # type: ignore
+            return
+        notifies = driver_conn.notifies
+        while notifies:
+            self._dispatch(notifies.pop(0).payload)
+
+    def _close(self) -> None:
+        if self._conn is not None:
+            # invalidate() closes without the pool's rollback-on-return,
+            # which would fail on a dead connection
+            self._conn.invalidate()
+            self._conn = None
+
+    async def run(self) -> None:
+        """Listen for notifications until cancelled, reconnecting as needed"""
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    await asyncio.to_thread(self._connect)
+                except Exception as e:
+                    logger.warning(f"Task event listener failed to connect: {e}")
+                    await asyncio.sleep(self.retry_interval)
+                    continue
+
+                self._lost = asyncio.Event()
+                fd = self._conn.driver_connection.fileno()  # type: ignore
+                loop.add_reader(fd, self._on_readable)
+                # Notifications may have been missed while disconnected
+                self._dispatch_all()
+                try:
+                    await self._lost.wait()
+                finally:
+                    loop.remove_reader(fd)
+                    self._close()
+                await asyncio.sleep(self.retry_interval)
+        finally:
+            if self._engine is not None:
+                self._engine.dispose()
+
+
+task_events = TaskEvents()
+
+Gauge(
+    "task_stream_subscribers",
+    "Open task change streams on this worker",
+    lambda: task_events.subscriber_count,
+)
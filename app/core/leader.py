@@ -0,0 +1,163 @@
+"""Leader election across instances using a Postgres advisory lock
+
+The leader holds a session-level ``pg_try_advisory_lock`` on a dedicated
+connection outside the main pool. Postgres drops the lock as soon as that
+session ends, so when the leader crashes or loses the database, another
+instance acquires the lock on its next attempt and takes over.
+"""
+
+from typing import Awaitable, Callable
+import asyncio
+import hashlib
+import logging
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+# TCP keepalives let the server notice a vanished leader and free its lock
+KEEPALIVE_ARGS = {
+    "keepalives": 1,
+    "keepalives_idle": 30,
+    "keepalives_interval": 10,
+    "keepalives_count": 3,
+}
+
+
+def _lock_key(name: str) -> int:
+    """Map a lock name to a stable signed 64-bit advisory lock key"""
+    digest = hashlib.sha256(name.encode()).digest()
+    return int.from_bytes(digest[:8], "big", signed=True)
+
+
+# Whether this session still holds the advisory lock. pg_locks splits a
+# bigint key into its high (classid) and low (objid) 32 bits
+HOLDS_LOCK_SQL = text(
+    """
+    SELECT EXISTS (
+        SELECT 1 FROM pg_locks
+        WHERE locktype = 'advisory'
+          AND pid = pg_backend_pid()
+          AND granted
+          AND classid::bigint = :classid
+          AND objid::bigint = :objid
+          AND objsubid = 1
+    )
+    """
+)
+
+
+class LeaderElection:
+    def __init__(
+        self,
+        name: str,
+        renew_interval: float = Config.LEADER_RENEW_INTERVAL_SECONDS,
+    ):
+        self.name = name
+        self.renew_interval = renew_interval
+        self.is_leader = False
+        self._key = _lock_key(name)
+        self._engine = create_engine(
+            Config.DATABASE_DIRECT_URL,  # type: ignore
+            poolclass=NullPool,
+            connect_args={
+                "connect_timeout": 10,
+                "application_name": f"task-flow-leader:{name}",
+                **KEEPALIVE_ARGS,
+            },
+        )
+        self._conn = None
+
+    def try_acquire(self) -> bool:
+        """Try to take the lock without waiting. Blocking"""
+        try:
+            if self._conn is None:
+                self._conn = self._engine.connect().execution_options(
+                    isolation_level="AUTOCOMMIT"
+                )
+            self.is_leader = bool(
+                self._conn.execute(
+                    text("SELECT pg_try_advisory_lock(:key)"), {"key": self._key}
+                ).scalar()
+            )
+        except Exception as e:
+            logger.warning(f"Leader election for {self.name} failed: {e}")
+            self._close()
+        return self.is_leader
+
+    def renew(self) -> bool:
+        """Confirm this session still holds the lock. Blocking
+
+        A round trip alone only shows the connection is up; the lock is
+        looked up in pg_locks, so one released behind our back (e.g. by
+        pg_advisory_unlock_all or a pooler swapping sessions) ends the lease.
+        """
+        unsigned = self._key & 0xFFFFFFFFFFFFFFFF
+        try:
+            held = self._conn.execute(  # type: ignore
+                HOLDS_LOCK_SQL,
+                {"classid": unsigned >> 32, "objid": unsigned & 0xFFFFFFFF},
+            ).scalar()
+        except Exception as e:
+            logger.warning(f"Lost leadership of {self.name}: {e}")
+            self._close()
+            return self.is_leader
+        if not held:
+            logger.warning(f"Lost leadership of {self.name}: lock no longer held")
+            self._close()
+        return self.is_leader
+
+    def release(self) -> None:
+        """Give up the lock if held. Blocking"""
+        if self.is_leader and self._conn is not None:
+            try:
+                self._conn.execute(
+                    text("SELECT pg_advisory_unlock(:key)"), {"key": self._key}
+                )
+            except Exception:
+                pass
+        self._close()
+
+    def _close(self) -> None:
+        self.is_leader = False
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    async def run(self, job: Callable[[], Awaitable[None]]) -> None:
+        """Run ``job`` only while this instance is the leader
+
+        Followers retry the lock every ``renew_interval`` seconds. The job is
+        cancelled if the lease cannot be renewed, and restarted on whichever
+        instance acquires the lock next.
+        """
+        job_task: asyncio.Task | None = None
+        try:
+            while True:
+                if self.is_leader:
+                    await asyncio.to_thread(self.renew)
+                else:
+                    await asyncio.to_thread(self.try_acquire)
+
+                if job_task is not None and job_task.done():
+                    job_task = None
+
+                if self.is_leader and job_task is None:
+                    logger.info(f"Acquired leadership of {self.name}")
+                    job_task = asyncio.create_task(job())
+                elif not self.is_leader and job_task is not None:
+                    job_task.cancel()
+                    job_task = None
+
+                await asyncio.sleep(self.renew_interval)
+        finally:
+            if job_task is not None:
+                job_task.cancel()
+            await asyncio.to_thread(self.release)
+            self._engine.dispose()
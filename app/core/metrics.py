@@ -0,0 +1,420 @@
+"""Minimal Prometheus-style metrics
+
+Collectors keep plain in-process counters guarded by a short lock, so
+recording a sample costs about as much as a dict lookup. Everything is
+rendered in the Prometheus text exposition format by ``render()``.
+
+Worker processes behind one port each answer some of the scrapes, so with
+``share()`` they pool their samples in a directory: each writes its own
+snapshot file, and ``render()`` merges them all. Counters and histograms
+are summed, exited workers included; gauges are reported per live worker
+with a ``worker`` label.
+"""
+
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from threading import Lock
+import asyncio
+import json
+import os
+import time
+import uuid
+
+from starlette.datastructures import MutableHeaders
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+_registry: list = []
+
+# Set by share(); None keeps everything in-process
+_shared_dir: Path | None = None
+# (pid, snapshot file name), renewed in forked children
+_snapshot_name: tuple[int, str] | None = None
+# Summed samples of workers that have exited, see merge_exited()
+_EXITED = "exited.json"
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = {} if labelnames else {(): 0}
+        self._lock = Lock()
+        _registry.append(self)
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def collect(self) -> list:
+        with self._lock:
+            return [[list(labels), value] for labels, value in self._values.items()]
+
+    @staticmethod
+    def merge(states: list[list]) -> list:
+        totals: dict[tuple, float] = {}
+        for state in states:
+            for labels, value in state:
+                totals[tuple(labels)] = totals.get(tuple(labels), 0) + value
+        return [[list(labels), value] for labels, value in totals.items()]
+
+    def render(self, state: list | None = None) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in self.collect() if state is None else state:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Gauge:
+    """Gauge whose value is read from ``callback`` at scrape time"""
+
+    def __init__(self, name: str, help: str, callback):
+        self.name = name
+        self.help = help
+        self.callback = callback
+        _registry.append(self)
+
+    def collect(self):
+        return self.callback()
+
+    def render(self, per_worker: dict[int, float] | None = None) -> list[str]:
+        """``per_worker`` maps worker pids to their values when shared"""
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        if per_worker is None:
+            value = self.collect()
+            if value is not None:
+                lines.append(f"{self.name} {value}")
+            return lines
+        for pid, value in sorted(per_worker.items()):
+            lines.append(f'{self.name}{{worker="{pid}"}} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._values: dict[tuple, list] = {}
+        self._lock = Lock()
+        _registry.append(self)
+
+    def observe(self, value: float, *labels) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def collect(self) -> list:
+        with self._lock:
+            return [
+                [list(labels), list(counts), total]
+                for labels, (counts, total) in self._values.items()
+            ]
+
+    @staticmethod
+    def merge(states: list[list]) -> list:
+        totals: dict[tuple, list] = {}
+        for state in states:
+            for labels, counts, total in state:
+                entry = totals.setdefault(tuple(labels), [[0] * len(counts), 0.0])
+                entry[0] = [a + b for a, b in zip(entry[0], counts)]
+                entry[1] += total
+        return [[list(labels), counts, total] for labels, (counts, total) in totals.items()]
+
+    def render(self, state: list | None = None) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, counts, total in self.collect() if state is None else state:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                label_str = _format_labels(self.labelnames, labels, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{label_str} {cumulative}")
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_str} {total}")
+            lines.append(f"{self.name}_count{label_str} {cumulative}")
+        return lines
+
+
+def render() -> str:
+    """Render every registered collector in Prometheus text format"""
+    if _shared_dir is not None:
+        return "\n".join(_render_shared()) + "\n"
+    lines = []
+    for collector in _registry:
+        lines.extend(collector.render())
+    return "\n".join(lines) + "\n"
+
+
+def share(directory: str) -> None:
+    """Pool samples with the other processes sharing ``directory``"""
+    global _shared_dir
+    _shared_dir = Path(directory)
+
+
+def _snapshot_path() -> Path:
+    global _snapshot_name
+    pid = os.getpid()
+    if _snapshot_name is None or _snapshot_name[0] != pid:
+        # Unique even if the pid of an exited worker is reused
+        _snapshot_name = (pid, f"{pid}-{uuid.uuid4().hex[:8]}.json")
+    return _shared_dir / _snapshot_name[1]  # type: ignore
+
+
+def _load(path: Path) -> dict | None:
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def _write(path: Path, data: dict) -> None:
+    temporary = path.with_suffix(".tmp")
+    temporary.write_text(json.dumps(data))
+    os.replace(temporary, path)
+
+
+def write_snapshot() -> None:
+    """Save this process's samples for the others to merge"""
+    if _shared_dir is not None:
+        _write(_snapshot_path(), {c.name: c.collect() for c in _registry})
+
+
+async def write_snapshots(interval: float) -> None:
+    """Write a snapshot every ``interval`` seconds until cancelled, and once
+    more on the way out"""
+    try:
+        while True:
+            await asyncio.to_thread(write_snapshot)
+            await asyncio.sleep(interval)
+    finally:
+        write_snapshot()
+
+
+def merge_exited(pid: int) -> None:
+    """Fold the snapshot of exited worker ``pid`` into the exited workers'
+    totals, so snapshot files don't pile up as workers are recycled.
+    Called by the process that reaped it, before it forks again"""
+    if _shared_dir is None:
+        return
+    paths = list(_shared_dir.glob(f"{pid}-*.json"))
+    if not paths:
+        return
+    exited = _load(_shared_dir / _EXITED) or {"samples": {}}
+    samples = [exited["samples"], *filter(None, map(_load, paths))]
+    merged = {
+        c.name: c.merge([s[c.name] for s in samples if c.name in s])
+        for c in _registry
+        if not isinstance(c, Gauge)
+    }
+    # Readers skip snapshots listed as merged until they are gone
+    _write(
+        _shared_dir / _EXITED,
+        {"samples": merged, "merged": [path.name for path in paths]},
+    )
+    for path in paths:
+        path.unlink(missing_ok=True)
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _render_shared() -> list[str]:
+    write_snapshot()
+    exited = _load(_shared_dir / _EXITED) or {"samples": {}, "merged": []}  # type: ignore
+    workers = []
+    for path in _shared_dir.glob("*-*.json"):  # type: ignore
+        samples = None if path.name in exited["merged"] else _load(path)
+        if samples is not None:
+            workers.append((int(path.name.split("-")[0]), samples))
+
+    lines = []
+    for collector in _registry:
+        if isinstance(collector, Gauge):
+            lines.extend(
+                collector.render(
+                    {
+                        pid: samples[collector.name]
+                        for pid, samples in workers
+                        if samples.get(collector.name) is not None and _alive(pid)
+                    }
+                )
+            )
+            continue
+        states = [
+            samples[collector.name]
+            for samples in (exited["samples"], *(samples for _, samples in workers))
+            if collector.name in samples
+        ]
+        lines.extend(collector.render(collector.merge(states)))
+    return lines
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency and status codes per route
+
+    Requests are labelled with the matched route template (``/api/tasks/{id}``)
+    rather than the raw path, which keeps the label set bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            method = scope["method"]
+            REQUEST_LATENCY.observe(time.perf_counter() - start, method, path)
+            REQUESTS_TOTAL.inc(method, path, str(status_code))
+
+
+# Server-Timing entries of the current request, see record_timing()
+_server_timings: ContextVar[dict[str, float] | None] = ContextVar(
+    "server_timings", default=None
+)
+
+
+def record_timing(name: str, seconds: float) -> None:
+    """Add ``seconds`` to the current request's Server-Timing entry ``name``.
+    Sync routes run in copies of the request context, so they share it"""
+    timings = _server_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+class ServerTimingMiddleware:
+    """ASGI middleware adding a Server-Timing header, which browser devtools
+    show next to the request: everything passed to record_timing() plus the
+    total time until the response started"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        timings: dict[str, float] = {}
+        token = _server_timings.set(timings)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                timings["total"] = time.perf_counter() - start
+                MutableHeaders(scope=message).append(
+                    "Server-Timing",
+                    ", ".join(
+                        f"{name};dur={seconds * 1000:.1f}"
+                        for name, seconds in timings.items()
+                    ),
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _server_timings.reset(token)
+
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route",
+    ("method", "route"),
+)
+REQUESTS_TOTAL = Counter(
+    "http_requests_total",
+    "HTTP responses by route and status code",
+    ("method", "route", "status"),
+)
+PASSWORD_HASH_SECONDS = Histogram(
+    "password_hash_duration_seconds",
+    "Time spent hashing or verifying passwords",
+    ("operation",),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.0),
+)
+CLEANUP_DURATION = Histogram(
+    "task_cleanup_duration_seconds",
+    "Duration of periodic task cleanup runs",
+    buckets=(0.01, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0),
+)
+CLEANUP_DELETED = Counter(
+    "task_cleanup_deleted_total",
+    "Tasks deleted by periodic cleanup",
+)
+DB_POOL_WAIT = Histogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting for a database connection from the pool",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+DB_CONNECT = Histogram(
+    "db_connect_seconds",
+    "Time spent opening new database connections",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+DB_POOL_REJECTED = Counter(
+    "db_pool_rejected_total",
+    "Requests answered 503 because no pooled connection freed up in time",
+)
+IDEMPOTENT_REQUESTS = Counter(
+    "idempotent_requests_total",
+    "Writes sent with an Idempotency-Key, by whether they ran or were replayed",
+    ("outcome",),
+)
@@ -0,0 +1,138 @@
+"""Password hashing on a dedicated, bounded process pool
+
+bcrypt/argon2 are CPU-bound by design. Running them in the request
+threadpool lets a burst of logins starve every other route, so hashing is
+sent to a small process pool of its own. Requests beyond the pool's queue
+limit are shed with a 503 instead of piling up.
+
+This module is imported by the pool's worker processes, so it must stay
+free of app imports beyond ``core.config``. FastAPI is only imported where
+the pool is driven from the app, and pwdlib with its hashers on first use,
+so neither the app's startup nor the workers' pays for what it doesn't use.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import cache
+import asyncio
+import multiprocessing
+import time
+
+from .config import Config
+
+
+@cache
+def _context():
+    from pwdlib import PasswordHash
+    from pwdlib.hashers.argon2 import Argon2Hasher
+    from pwdlib.hashers.bcrypt import BcryptHasher
+
+    argon2 = Argon2Hasher(
+        time_cost=Config.ARGON2_TIME_COST,
+        memory_cost=Config.ARGON2_MEMORY_COST,
+        parallelism=Config.ARGON2_PARALLELISM,
+    )
+    bcrypt = BcryptHasher(rounds=Config.BCRYPT_ROUNDS)
+    # The first hasher is used for new hashes; the others are only verified,
+    # and verify_and_update() rehashes them with the first one
+    if Config.PASSWORD_HASHER == "argon2":
+        return PasswordHash([argon2, bcrypt])
+    return PasswordHash([bcrypt, argon2])
+
+
+def _warm_up() -> None:
+    _context()
+
+
+def hash_password(password: str) -> str:
+    return _context().hash(password)
+
+
+def verify_password(password: str, hashed_password: str) -> bool:
+    return _context().verify(password, hashed_password)
+
+
+def _timed(fn, *args):
+    """``fn(*args)`` and how long it took, measured where it runs so time
+    spent queued for the pool isn't counted"""
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def verify_and_update(password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """Verify a password, returning a new hash if the stored one uses an
+    older algorithm or cost parameters"""
+    return _context().verify_and_update(password, hashed_password)
+
+
+class HashingPool:
+    """Process pool for password hashing with a cap on queued work
+
+    With ``workers=0`` hashing runs on one thread at a time instead, which
+    is handy for development and for workers whose share of the host's
+    hashing processes is 0. It gives up the isolation, but never takes
+    more than one of the threads serving sync routes.
+    """
+
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.in_flight = 0
+        self._executor: ProcessPoolExecutor | None = None
+        self._limiter = None
+
+    def start(self) -> None:
+        if self.workers and self._executor is None:
+            # spawn: forking a process that already runs threads is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            # Workers start on demand; a warm-up call per worker starts them
+            # now and has them load the hashers before the first login
+            for _ in range(self.workers):
+                self._executor.submit(_warm_up)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def run(self, fn, *args, record=None):
+        """Run ``fn(*args)`` on the pool. ``record`` is called with the
+        seconds ``fn`` itself took"""
+        from anyio import CapacityLimiter, to_thread
+        from fastapi import HTTPException, status
+
+        # Only touched from the event loop, so no lock is needed
+        if self.in_flight >= self.queue_limit:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please retry shortly",
+                headers={"Retry-After": "1"},
+            )
+
+        self.in_flight += 1
+        try:
+            if not self.workers:
+                if self._limiter is None:
+                    self._limiter = CapacityLimiter(1)
+                result, seconds = await to_thread.run_sync(
+                    _timed, fn, *args, limiter=self._limiter
+                )
+            else:
+                self.start()
+                loop = asyncio.get_running_loop()
+                result, seconds = await loop.run_in_executor(
+                    self._executor, _timed, fn, *args
+                )
+        finally:
+            self.in_flight -= 1
+        if record is not None:
+            record(seconds)
+        return result
+
+
+hashing_pool = HashingPool(
+    Config.PASSWORD_HASH_WORKERS, Config.PASSWORD_HASH_QUEUE_LIMIT
+)
@@ -0,0 +1,264 @@
+"""Read-replica routing for read-only routes
+
+Each replica gets its own engine and session factories next to the
+primary's. A background check measures every replica's replay lag, and
+``ReplicaRouter.pick`` hands out a replica only when:
+
+* the user has not written recently. Writes mark the user for
+  READ_YOUR_WRITES_SECONDS, so they see their own changes;
+* a replica is streaming and has checked in with a lag under
+  REPLICA_MAX_LAG_SECONDS.
+
+Otherwise the read goes to the primary, which is also where everything
+goes when DATABASE_REPLICA_URLS is empty. Each worker process remembers
+its own recent writers. Responses to writes also carry the write time in
+an X-Last-Write header and a cookie, so a client that sends either back
+reads its writes whichever worker serves it next.
+"""
+
+import asyncio
+import itertools
+import logging
+import math
+import time
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.requests import HTTPConnection
+from starlette.responses import Response
+
+from .cache import TTLCache
+from .config import Config
+from .database import (
+    AsyncSessionLocal,
+    SessionLocal,
+    _async_engine_config,
+    _count_query,
+    engine_config,
+    watch_connections,
+)
+from .metrics import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+# Seconds since the last replayed transaction, or 0 once everything received
+# has been replayed (an idle primary sends nothing, so the timestamp alone
+# would grow forever). NULL unless the server is a standby with a running
+# WAL receiver. Only pid is used from pg_stat_wal_receiver: without
+# pg_read_all_stats every other column reads NULL
+REPLICA_LAG_SQL = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery()
+            OR pg_last_wal_receive_lsn() IS NULL
+            OR NOT EXISTS (
+                SELECT 1 FROM pg_stat_wal_receiver WHERE pid IS NOT NULL
+            )
+        THEN NULL
+        WHEN pg_last_wal_receive_lsn() <= pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+    """
+)
+
+LAST_WRITE_COOKIE = "last_write"
+LAST_WRITE_HEADER = "X-Last-Write"
+
+READS_ROUTED = Counter(
+    "db_reads_routed_total",
+    "Read-only requests by the database that served them",
+    ("target",),
+)
+
+
+class Replica:
+    def __init__(self, url: str, name: str):
+        self.name = name
+        self.engine = create_engine(**{**engine_config, "url": url})
+        event.listen(self.engine, "before_cursor_execute", _count_query)
+        watch_connections(self.engine)
+        self.SessionLocal = sessionmaker(
+            autocommit=False, autoflush=False, bind=self.engine
+        )
+        self.AsyncSessionLocal = None
+        if Config.ASYNC_DB:
+            async_engine = create_async_engine(**_async_engine_config(url))
+            event.listen(async_engine.sync_engine, "before_cursor_execute", _count_query)
+            watch_connections(async_engine)
+            self.AsyncSessionLocal = async_sessionmaker(
+                async_engine, autoflush=False, expire_on_commit=False, class_=AsyncSession
+            )
+        # None until the first successful check, and whenever one fails
+        self.lag: float | None = None
+        self.checked_at = 0.0
+
+    def check(self) -> None:
+        """Measure replay lag. Blocking"""
+        try:
+            with self.engine.connect() as conn:
+                lag = conn.execute(REPLICA_LAG_SQL).scalar()
+        except Exception as e:
+            if self.lag is not None:
+                logger.warning(f"Replica {self.name} is unavailable: {e}")
+            lag = None
+        else:
+            if lag is None and self.lag is not None:
+                logger.warning(f"Replica {self.name} is not streaming from the primary")
+        self.lag = float(lag) if lag is not None else None
+        self.checked_at = time.monotonic()
+
+
+class ReplicaRouter:
+    def __init__(
+        self,
+        urls: list[str],
+        max_lag: float = Config.REPLICA_MAX_LAG_SECONDS,
+        check_interval: float = Config.REPLICA_CHECK_INTERVAL_SECONDS,
+        read_your_writes: float = Config.READ_YOUR_WRITES_SECONDS,
+    ):
+        self.replicas = [
+            Replica(url, f"replica-{index}") for index, url in enumerate(urls)
+        ]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.read_your_writes = read_your_writes
+        # Evicting a writer early only costs read-your-writes on replicas
+        # that are within max_lag anyway
+        self._recent_writers = TTLCache(
+            "recent_writers", Config.USER_CACHE_SIZE, read_your_writes
+        )
+        self._turn = itertools.count()
+        self._ever_healthy = False
+        self._warned_unhealthy = False
+
+    def note_write(
+        self,
+        user_id: str,
+        request: HTTPConnection | None = None,
+        response: Response | None = None,
+    ) -> None:
+        """Send the user's reads to the primary for a while. ``response``
+        gets the write time in LAST_WRITE_HEADER and LAST_WRITE_COOKIE,
+        which other workers go by"""
+        if not self.replicas:
+            return
+        self._recent_writers.set(user_id, True)
+        if response is None:
+            return
+        wrote_at = f"{time.time():.3f}"
+        response.headers[LAST_WRITE_HEADER] = wrote_at
+        # Browsers only attach SameSite=None cookies to cross-site fetches,
+        # and only Secure ones at that
+        cross_site = request is not None and _is_cross_site(request)
+        https = request is not None and request.url.scheme == "https"
+        response.set_cookie(
+            LAST_WRITE_COOKIE,
+            wrote_at,
+            max_age=math.ceil(self.read_your_writes),
+            httponly=True,
+            samesite="none" if cross_site else "lax",
+            secure=cross_site or https,
+        )
+
+    def _wrote_recently(self, user_id: str, wrote_at: float | None) -> bool:
+        if self._recent_writers.get(user_id):
+            return True
+        return wrote_at is not None and time.time() - wrote_at < self.read_your_writes
+
+    def healthy(self) -> list[Replica]:
+        # A check that hasn't reported back in a while counts as failed
+        fresh_after = time.monotonic() - 3 * self.check_interval
+        return [
+            replica
+            for replica in self.replicas
+            if replica.lag is not None
+            and replica.lag <= self.max_lag
+            and replica.checked_at >= fresh_after
+        ]
+
+    def pick(self, user_id: str, wrote_at: float | None = None) -> Replica | None:
+        """Replica to serve a read for ``user_id``, whose client last wrote
+        at ``wrote_at`` if known, or None for the primary"""
+        replica = None
+        if self.replicas and not self._wrote_recently(user_id, wrote_at):
+            healthy = self.healthy()
+            if healthy:
+                replica = healthy[next(self._turn) % len(healthy)]
+        READS_ROUTED.inc(replica.name if replica else "primary")
+        return replica
+
+    def session(self, user_id: str, wrote_at: float | None = None) -> Session:
+        replica = self.pick(user_id, wrote_at)
+        return (replica.SessionLocal if replica else SessionLocal)()
+
+    def async_session(
+        self, user_id: str, wrote_at: float | None = None
+    ) -> AsyncSession:
+        replica = self.pick(user_id, wrote_at)
+        return (replica.AsyncSessionLocal if replica else AsyncSessionLocal)()  # type: ignore
+
+    async def run(self) -> None:
+        """Check every replica's lag until cancelled"""
+        while True:
+            await asyncio.gather(
+                *(asyncio.to_thread(replica.check) for replica in self.replicas)
+            )
+            if not self._ever_healthy:
+                self._note_first_healthy()
+            await asyncio.sleep(self.check_interval)
+
+    def _note_first_healthy(self) -> None:
+        # A misconfigured replica fails quietly, sending every read to the
+        # primary, so say so once if the first round finds none usable
+        if self.healthy():
+            self._ever_healthy = True
+            return
+        if self._warned_unhealthy:
+            return
+        self._warned_unhealthy = True
+        states = ", ".join(
+            f"{replica.name} "
+            + (f"lag {replica.lag:.1f}s" if replica.lag is not None else "not streaming")
+            for replica in self.replicas
+        )
+        logger.warning(
+            f"No read replica qualifies, reads go to the primary ({states}). "
+            "Check that each replica is a streaming standby"
+        )
+
+
+def _is_cross_site(request: HTTPConnection) -> bool:
+    origin = request.headers.get("origin")
+    own_origin = f"{request.url.scheme}://{request.url.netloc}"
+    return origin is not None and origin != own_origin
+
+
+def last_write_time(request: HTTPConnection) -> float | None:
+    """Write time a client sent back in LAST_WRITE_HEADER or
+    LAST_WRITE_COOKIE, if it sent a valid one"""
+    value = request.headers.get(LAST_WRITE_HEADER) or request.cookies.get(
+        LAST_WRITE_COOKIE
+    )
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+replica_router = ReplicaRouter(Config.DATABASE_REPLICA_URLS)
+
+
+def _worst_lag():
+    lags = [replica.lag for replica in replica_router.replicas]
+    if not lags:
+        return None
+    # An unavailable replica reports -1 rather than disappearing from the graph
+    return -1 if None in lags else max(lags)
+
+
+Gauge(
+    "db_replica_lag_seconds",
+    "Replay lag of the most delayed read replica (-1 if one is unavailable)",
+    _worst_lag,
+)
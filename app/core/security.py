@@ -1,33 +1,79 @@
 from datetime import datetime, timedelta
+import hashlib
+import time
 
-from core.database import get_db
-from fastapi import Depends, HTTPException, status
+from core.database import (
+    AsyncSessionLocal,
+    SessionLocal,
+    async_engine,
+    engine,
+    get_async_db,
+    get_db,
+    run_db,
+)
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
 from models.user_model import User
-from pwdlib import PasswordHash
-from pwdlib.hashers.bcrypt import BcryptHasher
 from pydantic import BaseModel
 from schemas.user_schema import UserResponse
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from .cache import TTLCache
+from . import passwords
 from .config import Config
+from .metrics import PASSWORD_HASH_SECONDS, Gauge
+from .passwords import hashing_pool
+from .replicas import last_write_time, replica_router
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+_optional_oauth2_scheme = OAuth2PasswordBearer(
+    tokenUrl="/api/auth/login", auto_error=False
+)
 
 
-pwd_context = PasswordHash([BcryptHasher()])
 ALGORITHM = "HS256"
 
+Gauge(
+    "password_hash_in_flight",
+    "Password hashes running or queued on the hashing pool",
+    lambda: hashing_pool.in_flight,
+)
+
 
 class Bcrypt:
+    """Password hashing. The sync methods hash inline; the async ones run on
+    the dedicated hashing pool and may raise 503 when it is saturated"""
+
     @staticmethod
     def hash_password(password: str) -> str:
-        return pwd_context.hash(password)
+        with PASSWORD_HASH_SECONDS.time("hash"):
+            return passwords.hash_password(password)
 
     @staticmethod
     def verify_password(plain_password: str, hashed_password: str) -> bool:
-        return pwd_context.verify(plain_password, hashed_password)
+        with PASSWORD_HASH_SECONDS.time("verify"):
+            return passwords.verify_password(plain_password, hashed_password)
+
+    @staticmethod
+    async def hash_password_async(password: str) -> str:
+        return await hashing_pool.run(
+            passwords.hash_password,
+            password,
+            record=lambda seconds: PASSWORD_HASH_SECONDS.observe(seconds, "hash"),
+        )
+
+    @staticmethod
+    async def verify_and_update_async(
+        plain_password: str, hashed_password: str
+    ) -> tuple[bool, str | None]:
+        return await hashing_pool.run(
+            passwords.verify_and_update,
+            plain_password,
+            hashed_password,
+            record=lambda seconds: PASSWORD_HASH_SECONDS.observe(seconds, "verify"),
+        )
 
 
 class Token(BaseModel):
@@ -35,6 +81,11 @@ class Token(BaseModel):
     token_type: str = "Bearer"
 
 
+token_cache = TTLCache(
+    "tokens", Config.TOKEN_CACHE_SIZE, Config.TOKEN_EXPIRE_MINUTES * 60
+)
+
+
 class JWTHandler:
     @staticmethod
     def encode_data(
@@ -43,6 +94,8 @@ class JWTHandler:
         algorithm: str = ALGORITHM,
         expires_in: timedelta | None = None,
     ) -> str:
+        from jose import jwt  # loaded on first use, off the startup path
+
         to_encode = data.copy()
         if expires_in:
             expires = datetime.now() + expires_in
@@ -58,25 +111,103 @@ class JWTHandler:
         secret_key: str = Config.SECRET_KEY,  # type: ignore
         algorithms: list[str] = [ALGORITHM],
     ) -> dict:
+        # Clients resend the same token until it expires, so verified claims
+        # are memoized under a digest of the token (never the token itself)
+        key = (
+            hashlib.sha256(token.encode()).digest(),
+            hashlib.sha256(secret_key.encode()).digest(),
+            tuple(algorithms),
+        )
+        payload = token_cache.get(key)
+        if payload is not None:
+            return dict(payload)
+
+        from jose import JWTError, jwt
+
         try:
             payload = jwt.decode(token, secret_key, algorithms=algorithms)
-            return payload
         except JWTError:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid token. Could not validate user",
             )
 
+        # Evict at the token's own expiry so a cached entry never outlives it
+        if isinstance(payload.get("exp"), (int, float)):
+            expires_at = time.monotonic() + (payload["exp"] - time.time())
+            token_cache.set(key, dict(payload), expires_at=expires_at)
+        return payload
+
 
-def authenticate_user(email: str, password: str, db: Session):
-    user = db.query(User).filter(User.email == email).first()
+def get_user_by_email(email: str, db: Session) -> User | None:
+    return db.query(User).filter(User.email == email).first()
 
-    if not user or not Bcrypt.verify_password(password, user.hashed_password):  # type: ignore
+
+def update_password_hash(user_id: str, hashed_password: str, db: Session) -> None:
+    db.query(User).filter(User.id == user_id).update(
+        {"hashed_password": hashed_password}, synchronize_session=False
+    )
+    invalidate_cached_users(db, user_id)
+    db.commit()
+
+
+async def authenticate_user(email: str, password: str, db: Session | AsyncSession):
+    user = await run_db(get_user_by_email, db, email)
+    if not user:
         return
 
+    valid, new_hash = await Bcrypt.verify_and_update_async(
+        password, user.hashed_password  # type: ignore
+    )
+    if not valid:
+        return
+
+    # Transparently move the stored hash to the current algorithm/cost
+    if new_hash:
+        await run_db(update_password_hash, db, user.id, new_hash)
     return user
 
 
+# Authenticated users by id, so most requests skip the users lookup.
+# Entries are dropped once a transaction that updated or deleted the User
+# through the ORM commits. Bulk update()/delete() and raw SQL bypass that:
+# call invalidate_cached_users() before committing them. Other worker
+# processes keep their entries for up to USER_CACHE_TTL_SECONDS.
+user_cache = TTLCache("users", Config.USER_CACHE_SIZE, Config.USER_CACHE_TTL_SECONDS)
+
+# session.info key of the user ids to evict when the session commits
+_CHANGED_USERS = "changed_user_ids"
+
+
+def invalidate_cached_users(db: Session, *user_ids: str) -> None:
+    """Evict ``user_ids`` from user_cache once ``db`` commits"""
+    db.info.setdefault(_CHANGED_USERS, set()).update(user_ids)
+
+
+@event.listens_for(Session, "after_flush")
+def _note_changed_users(session: Session, flush_context) -> None:
+    changed = [
+        obj.id
+        for obj in (*session.dirty, *session.deleted)
+        if isinstance(obj, User)
+    ]
+    if changed:
+        invalidate_cached_users(session, *changed)
+
+
+@event.listens_for(Session, "after_commit")
+def _evict_changed_users(session: Session) -> None:
+    for user_id in session.info.pop(_CHANGED_USERS, ()):
+        user_cache.pop(user_id)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_changed_users(session: Session, previous_transaction) -> None:
+    # The rows are unchanged, so the cached users are still right
+    if previous_transaction.parent is None:
+        session.info.pop(_CHANGED_USERS, None)
+
+
 def get_user_by_id(db: Session, user_id: str) -> User:
     """Fetch a user by their ID."""
     user = db.query(User).filter(User.id == user_id).first()
@@ -87,11 +218,102 @@ def get_user_by_id(db: Session, user_id: str) -> User:
     return user
 
 
+def _check_active(user: UserResponse) -> UserResponse:
+    if not user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Inactive user"
+        )
+    return user
+
+
 def get_current_user(
     db: Session = Depends(get_db),
     token: str = Depends(oauth2_scheme),
 ) -> UserResponse:
     """Retrieve the current user based on the provided JWT token."""
     payload = JWTHandler.decode_token(token)
-    user = get_user_by_id(db, payload["user_id"])
-    return UserResponse(**user.__dict__)
+    user = user_cache.get(payload["user_id"])
+    if user is None:
+        user = UserResponse.model_validate(get_user_by_id(db, payload["user_id"]))
+        user_cache.set(payload["user_id"], user)
+    return _check_active(user)
+
+
+async def get_current_user_async(
+    db: AsyncSession = Depends(get_async_db),
+    token: str = Depends(oauth2_scheme),
+) -> UserResponse:
+    """Async-session counterpart of get_current_user."""
+    payload = JWTHandler.decode_token(token)
+    user = user_cache.get(payload["user_id"])
+    if user is None:
+        db_user = await db.run_sync(get_user_by_id, payload["user_id"])
+        user = UserResponse.model_validate(db_user)
+        user_cache.set(payload["user_id"], user)
+    return _check_active(user)
+
+
+def event_stream_token(
+    request: Request,
+    header_token: str | None = Depends(_optional_oauth2_scheme),
+    access_token: str | None = None,
+) -> str:
+    """Token for server-sent event routes. Browsers' EventSource can't send
+    an Authorization header, so the ``access_token`` query parameter or
+    cookie is accepted too"""
+    token = header_token or access_token or request.cookies.get("access_token")
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return token
+
+
+def get_read_db(request: Request, token: str = Depends(oauth2_scheme)):
+    """Session for read-only routes, on a replica when replica_router allows"""
+    db = replica_router.session(
+        JWTHandler.decode_token(token)["user_id"], last_write_time(request)
+    )
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db(request: Request, token: str = Depends(oauth2_scheme)):
+    async with replica_router.async_session(
+        JWTHandler.decode_token(token)["user_id"], last_write_time(request)
+    ) as db:
+        yield db
+
+
+def get_current_reader(
+    db: Session = Depends(get_read_db),
+    token: str = Depends(oauth2_scheme),
+) -> UserResponse:
+    """get_current_user for read-only routes, looked up on their read
+    session. A user who registered moments ago may not have reached the
+    replica yet, so a miss there is retried on the primary."""
+    try:
+        return get_current_user(db, token)
+    except HTTPException as e:
+        if e.status_code != status.HTTP_404_NOT_FOUND or db.get_bind() is engine:
+            raise
+    with SessionLocal() as primary:
+        return get_current_user(primary, token)
+
+
+async def get_current_reader_async(
+    db: AsyncSession = Depends(get_async_read_db),
+    token: str = Depends(oauth2_scheme),
+) -> UserResponse:
+    """Async-session counterpart of get_current_reader."""
+    try:
+        return await get_current_user_async(db, token)
+    except HTTPException as e:
+        if e.status_code != status.HTTP_404_NOT_FOUND or db.bind is async_engine:
+            raise
+    async with AsyncSessionLocal() as primary:  # type: ignore
+        return await get_current_user_async(primary, token)
@@ -1,15 +1,32 @@
 from api.routes.auth import auth_router
-from api.routes.task import task_router
-from core.database import Base, engine, SessionLocal
+from api.routes.task import task_router, IDEMPOTENCY_QUERIES, QUERY_BUDGETS
+from core.database import Base, engine, SessionLocal, count_queries, prewarm_pool
 from core.config import Config
-from fastapi import FastAPI
+from core.events import task_events
+from core.leader import LeaderElection
+from core.passwords import hashing_pool
+from core.replicas import LAST_WRITE_HEADER, replica_router
+from core import metrics
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from services.task_service import delete_completed_or_due_tasks
+from fastapi.responses import JSONResponse
+from services.idempotency_service import prune_idempotency_keys
+from services.task_service import (
+    delete_completed_or_due_tasks,
+    prune_task_tombstones,
+    reconcile_task_counts,
+)
+from anyio import to_thread
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
 import asyncio
 import logging
 import os
+import random
+import threading
+import time
 from sqlalchemy import select
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 
 
 # Configure logging
@@ -24,66 +41,149 @@ except ValueError as e:
     logger.error(f"Configuration error: {e}")
     raise
 
-Base.metadata.create_all(engine)
-
-# Track background task across lifespan
-_cleanup_task = None
-
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Start background task only if this is the primary instance
-    global _cleanup_task
-    is_render = os.getenv("RENDER") == "true"
-    is_railway = os.getenv("RAILWAY_ENVIRONMENT") is not None
-    is_heroku = os.getenv("DYNO") is not None
-
-    # Only run background task on single-instance or primary instances
-    should_run_cleanup = (
-        not (is_render or is_railway or is_heroku)
-        or os.getenv("RUN_BACKGROUND_TASKS", "true") == "true"
+    # The schema belongs to Alembic (see the Procfile's release step), so
+    # booting a worker runs no DDL or reflection queries unless asked to
+    if Config.DB_CREATE_ALL:
+        await asyncio.to_thread(Base.metadata.create_all, engine)
+    # Sync routes hold a connection per thread, so DB_POOL_SIZE is sized
+    # against this limit
+    to_thread.current_default_thread_limiter().total_tokens = Config.THREADPOOL_SIZE
+    opened = await prewarm_pool()
+    if opened:
+        logger.info(f"Pre-warmed {opened} database connections")
+    # Spawn the password hashing workers now rather than on the first login
+    hashing_pool.start()
+    # One LISTEN connection per worker feeds every /api/tasks/stream client
+    events_task = asyncio.create_task(task_events.run())
+    # Replicas serve reads only once a lag check has found them in sync
+    replica_task = (
+        asyncio.create_task(replica_router.run()) if replica_router.replicas else None
+    )
+    # Lets whichever worker answers a scrape report every worker's samples
+    metrics_task = (
+        asyncio.create_task(
+            metrics.write_snapshots(Config.METRICS_SNAPSHOT_INTERVAL_SECONDS)
+        )
+        if Config.METRICS_ENABLED and Config.METRICS_DIR
+        else None
     )
 
-    if should_run_cleanup:
-        _cleanup_task = asyncio.create_task(cleanup_tasks_periodically())
-        logger.info("Background task cleanup started")
-    else:
-        logger.info(
-            "Background task cleanup skipped (not primary dyno or scaled environment)"
+    # Every instance campaigns for leadership; only the one holding the
+    # advisory lock runs the cleanup loop, and another takes over if it dies
+    cleanup_task = None
+    if Config.RUN_BACKGROUND_TASKS:
+        # Cleanup runs on its own thread so a long DELETE never blocks the
+        # event loop or takes a slot in the threadpool that serves sync
+        # routes. Both are per lifespan, so the app can start again
+        cleanup_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="task-cleanup"
         )
+        cleanup_stop = threading.Event()
+        election = LeaderElection("task-flow:cleanup")
+        cleanup_task = asyncio.create_task(
+            election.run(
+                lambda: cleanup_tasks_periodically(
+                    cleanup_executor, cleanup_stop, election
+                )
+            )
+        )
+        logger.info("Background task cleanup started (leader election)")
+    else:
+        logger.info("Background task cleanup disabled by RUN_BACKGROUND_TASKS")
 
     yield
 
     # Shutdown: Cancel background task
-    if _cleanup_task:
+    if cleanup_task:
         logger.info("Shutting down background task cleanup")
-        _cleanup_task.cancel()
+        # Let a running cleanup finish its current batch and exit
+        cleanup_stop.set()
+        cleanup_task.cancel()
         try:
-            await _cleanup_task
+            await cleanup_task
         except asyncio.CancelledError:
             logger.info("Background task cleanup cancelled successfully")
+        await asyncio.to_thread(cleanup_executor.shutdown)
+    hashing_pool.shutdown()
+    for task in (events_task, replica_task, metrics_task):
+        if task is None:
+            continue
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+
+def run_cleanup(
+    stop: threading.Event | None = None, election: LeaderElection | None = None
+) -> int:
+    """Run one cleanup pass. Blocking; called on the cleanup executor thread
+
+    Cancelling the asyncio task that waits for this doesn't stop the
+    thread, so the pass checks between batches that ``stop`` isn't set and
+    that ``election`` still holds the lease, and stops as soon as either
+    fails.
+    """
+    deadline = time.monotonic() + Config.CLEANUP_MAX_RUNTIME_SECONDS
+
+    def lost_leadership() -> bool:
+        return election is not None and not election.is_leader
+
+    def should_stop() -> bool:
+        return (
+            (stop is not None and stop.is_set())
+            or time.monotonic() > deadline
+            or lost_leadership()
+        )
 
+    db = SessionLocal()
+    start = time.perf_counter()
+    try:
+        deleted_count = delete_completed_or_due_tasks(db, should_stop=should_stop)
+        metrics.CLEANUP_DELETED.inc(amount=deleted_count)
+        if deleted_count > 0:
+            logger.info(f"Deleted {deleted_count} completed or overdue tasks")
+        if lost_leadership():
+            return deleted_count
+        pruned_count = prune_task_tombstones(db)
+        if pruned_count > 0:
+            logger.info(f"Pruned {pruned_count} expired task tombstones")
+        pruned_keys = prune_idempotency_keys(db)
+        if pruned_keys > 0:
+            logger.info(f"Pruned {pruned_keys} expired idempotency keys")
+        reconcile_task_counts(db)
+        return deleted_count
+    finally:
+        metrics.CLEANUP_DURATION.observe(time.perf_counter() - start)
+        db.close()
 
-async def cleanup_tasks_periodically():
+
+async def cleanup_tasks_periodically(
+    executor: ThreadPoolExecutor,
+    stop: threading.Event,
+    election: LeaderElection | None = None,
+):
     """Periodically delete tasks that are done or past due date"""
     # Wait a bit before first run to allow app to fully start
     await asyncio.sleep(5)
+    loop = asyncio.get_running_loop()
 
     while True:
         try:
-            db = SessionLocal()
-            try:
-                deleted_count = delete_completed_or_due_tasks(db)
-                if deleted_count > 0:
-                    logger.info(f"Deleted {deleted_count} completed or overdue tasks")
-            finally:
-                db.close()
+            await loop.run_in_executor(executor, run_cleanup, stop, election)
         except Exception as e:
             logger.error(f"Error in cleanup_tasks_periodically: {e}")
 
-        # Sleep for 1 hour
+        # Jitter spreads runs from instances that started together
+        interval = Config.CLEANUP_INTERVAL_SECONDS + random.uniform(
+            0, Config.CLEANUP_JITTER_SECONDS
+        )
         try:
-            await asyncio.sleep(60 * 60)
+            await asyncio.sleep(interval)
         except asyncio.CancelledError:
             break
 
@@ -115,12 +215,64 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=allowed_origins,
     allow_credentials=True,
-    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
     allow_headers=["*"],
-    expose_headers=["*"],
+    # With credentials, browsers read "*" as a header name, so headers
+    # clients need are listed too
+    expose_headers=["*", LAST_WRITE_HEADER],
 )
 
 
+if Config.QUERY_BUDGET_CHECKS:
+
+    @app.middleware("http")
+    async def enforce_query_budgets(request: Request, call_next):
+        """Report the SQL statement count of each request and flag successful
+        ones that exceed their entry in QUERY_BUDGETS. Error responses may
+        run an extra lookup to pick the right status code"""
+        with count_queries() as counter:
+            response = await call_next(request)
+
+        response.headers["X-Query-Count"] = str(counter[0])
+        route = request.scope.get("route")
+        budget = route and QUERY_BUDGETS.get((request.method, route.path))
+        if budget and "Idempotency-Key" in request.headers:
+            budget += IDEMPOTENCY_QUERIES
+        if budget and response.status_code < 400 and counter[0] > budget:
+            logger.error(
+                f"{request.method} {route.path} ran {counter[0]} SQL statements "
+                f"(budget {budget})"
+            )
+        return response
+
+
+if Config.SERVER_TIMING:
+    app.add_middleware(metrics.ServerTimingMiddleware)
+
+
+@app.exception_handler(PoolTimeoutError)
+async def pool_exhausted(request: Request, exc: PoolTimeoutError):
+    """Shed load when every pooled connection stayed busy for the whole
+    DB_POOL_TIMEOUT_SECONDS, rather than queueing requests behind them"""
+    metrics.DB_POOL_REJECTED.inc()
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server is busy, please retry shortly"},
+        headers={"Retry-After": "1"},
+    )
+
+
+if Config.METRICS_ENABLED:
+    if Config.METRICS_DIR:
+        metrics.share(Config.METRICS_DIR)
+    # Added last so it wraps everything else and times the whole request
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    def get_metrics():
+        return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
 app.include_router(auth_router)
 app.include_router(task_router)
 
@@ -1,2 +1,3 @@
 from .user_model import User
-from .task_model import Task
+from .task_model import Task, TaskCount, TaskTombstone
+from .idempotency_model import IdempotencyKey
@@ -0,0 +1,23 @@
+from core.database import Base
+from sqlalchemy import Column, DateTime, LargeBinary, SmallInteger, String, func
+from sqlalchemy.dialects.postgresql import JSONB
+
+
+class IdempotencyKey(Base):
+    """A write sent with an Idempotency-Key and the response it got, which
+    retries of the same request are served instead of running it again.
+    Pruned once older than IDEMPOTENCY_KEY_TTL_HOURS"""
+
+    __tablename__ = "idempotency_keys"
+
+    # Keys are chosen by clients, so they are only unique per user
+    owner_id = Column(String(36), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    # SHA-256 of the request, to refuse a key reused for a different one
+    request_hash = Column(LargeBinary, nullable=False)
+    # Filled in by the claiming transaction before it commits
+    status_code = Column(SmallInteger, nullable=True)
+    response = Column(JSONB, nullable=True)
+    created_at = Column(
+        DateTime, nullable=False, server_default=func.now(), index=True
+    )
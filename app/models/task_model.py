@@ -3,7 +3,22 @@ from enum import Enum as PyEnum
 from uuid import uuid4
 
 from core.database import Base
-from sqlalchemy import Column, Date, DateTime, ForeignKey, String
+from sqlalchemy import (
+    DDL,
+    BigInteger,
+    Column,
+    Date,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    UniqueConstraint,
+    event,
+    func,
+    literal_column,
+    text,
+)
 from sqlalchemy import Enum as SQLEnum
 from sqlalchemy.orm import relationship
 
@@ -15,18 +30,64 @@ class TaskStatus(PyEnum):
     cancelled = "cancelled"
 
 
+def default_due_date():
+    return datetime.now().date() + timedelta(days=7)
+
+
+# Id of the writing transaction, stamped on every task write and deletion.
+# Comparing it against a saved pg_current_snapshot() tells which changes a
+# client hasn't seen yet, regardless of commit order.
+CURRENT_XID_SQL = "pg_current_xact_id()::text::bigint"
+
+
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        # Titles are unique per owner, not across all users
+        UniqueConstraint("owner_id", "title", name="uq_tasks_owner_title"),
+        # Keyset pagination: one index per sort order, scoped to the owner
+        Index("ix_tasks_owner_due_date_id", "owner_id", "due_date", "id"),
+        Index("ix_tasks_owner_created_at_id", "owner_id", "created_at", "id"),
+        # List filters
+        Index("ix_tasks_owner_status", "owner_id", "status"),
+        Index(
+            "ix_tasks_owner_title_prefix",
+            "owner_id",
+            "title",
+            postgresql_ops={"title": "text_pattern_ops"},
+        ),
+        # Expiry cleanup: "status = 'done' OR due_date <= today" is answered
+        # by OR-ing these two partial indexes
+        Index(
+            "ix_tasks_cleanup_done",
+            "id",
+            postgresql_where=text("status = 'done'"),
+        ),
+        Index(
+            "ix_tasks_cleanup_due_date",
+            "due_date",
+            postgresql_where=text("due_date IS NOT NULL"),
+        ),
+        # Delta sync: the user's tasks changed since a snapshot
+        Index("ix_tasks_owner_change_xid", "owner_id", "change_xid"),
+    )
 
     id = Column(String(36), primary_key=True, index=True, default=lambda: str(uuid4()))
-    title = Column(String, nullable=False,unique=True, index=True)
+    title = Column(String, nullable=False)
     description = Column(String, nullable=True)
     status = Column(SQLEnum(TaskStatus), default=TaskStatus.todo, nullable=False)
-    due_date = Column(
-        Date, nullable=True, default=lambda: (datetime.now().date() + timedelta(days=7))
-    )
+    due_date = Column(Date, nullable=True, default=default_due_date)
     owner_id = Column(String(36), ForeignKey("users.id"), nullable=False, index=True)
     owner = relationship("User", back_populates="tasks")
+    # Bumped by every write; clients send it back in If-Match to detect
+    # concurrent edits
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    change_xid = Column(
+        BigInteger,
+        nullable=False,
+        server_default=text(CURRENT_XID_SQL),
+        onupdate=literal_column(CURRENT_XID_SQL),
+    )
 
     created_at = Column(DateTime, default=lambda: datetime.now())
     updated_at = Column(
@@ -34,3 +95,103 @@ class Task(Base):
         default=lambda: datetime.now(),
         onupdate=lambda: datetime.now(),
     )
+
+
+class TaskTombstone(Base):
+    """Marker left behind by a deleted task so delta sync can report it.
+    Pruned once older than TOMBSTONE_RETENTION_DAYS"""
+
+    __tablename__ = "task_tombstones"
+    __table_args__ = (
+        Index("ix_task_tombstones_owner_deleted_xid", "owner_id", "deleted_xid"),
+    )
+
+    task_id = Column(String(36), primary_key=True)
+    owner_id = Column(String(36), nullable=False)
+    deleted_xid = Column(
+        BigInteger, nullable=False, server_default=text(CURRENT_XID_SQL)
+    )
+    deleted_at = Column(
+        DateTime, nullable=False, server_default=func.now(), index=True
+    )
+
+
+class TaskCount(Base):
+    """Number of tasks per owner, status and due date
+
+    Maintained by statement-level triggers on ``tasks`` (below), so every
+    write updates it in the same transaction. Tasks without a due date are
+    counted under ``'infinity'``. Drift is repaired by
+    ``task_service.reconcile_task_counts``.
+    """
+
+    __tablename__ = "task_counts"
+
+    owner_id = Column(String(36), primary_key=True)
+    status = Column(SQLEnum(TaskStatus), primary_key=True)
+    due_date = Column(Date, primary_key=True)
+    count = Column(Integer, nullable=False)
+
+
+# One function for all three triggers; each statement's changed rows are
+# grouped into buckets so a batch costs one upsert per bucket
+TASK_COUNTS_DDL = (
+    """
+    CREATE OR REPLACE FUNCTION task_counts_apply() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO task_counts AS c (owner_id, status, due_date, count)
+            SELECT owner_id, status, coalesce(due_date, 'infinity'), count(*)
+            FROM new_rows
+            GROUP BY 1, 2, 3 ORDER BY 1, 2, 3
+            ON CONFLICT (owner_id, status, due_date)
+            DO UPDATE SET count = c.count + EXCLUDED.count;
+        ELSIF TG_OP = 'DELETE' THEN
+            INSERT INTO task_counts AS c (owner_id, status, due_date, count)
+            SELECT owner_id, status, coalesce(due_date, 'infinity'), -count(*)
+            FROM old_rows
+            GROUP BY 1, 2, 3 ORDER BY 1, 2, 3
+            ON CONFLICT (owner_id, status, due_date)
+            DO UPDATE SET count = c.count + EXCLUDED.count;
+        ELSE
+            -- Only updates that move a task between buckets write anything
+            INSERT INTO task_counts AS c (owner_id, status, due_date, count)
+            SELECT owner_id, status, due_date, sum(delta)
+            FROM (
+                SELECT owner_id, status, coalesce(due_date, 'infinity') AS due_date,
+                       1 AS delta
+                FROM new_rows
+                UNION ALL
+                SELECT owner_id, status, coalesce(due_date, 'infinity'), -1
+                FROM old_rows
+            ) AS changes
+            GROUP BY 1, 2, 3 HAVING sum(delta) <> 0 ORDER BY 1, 2, 3
+            ON CONFLICT (owner_id, status, due_date)
+            DO UPDATE SET count = c.count + EXCLUDED.count;
+        END IF;
+        RETURN NULL;
+    END
+    $$
+    """,
+    """
+    CREATE TRIGGER tasks_count_insert AFTER INSERT ON tasks
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION task_counts_apply()
+    """,
+    """
+    CREATE TRIGGER tasks_count_update AFTER UPDATE ON tasks
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION task_counts_apply()
+    """,
+    """
+    CREATE TRIGGER tasks_count_delete AFTER DELETE ON tasks
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION task_counts_apply()
+    """,
+)
+
+# Databases built with metadata.create_all() get the triggers too
+TaskCount.__table__.add_is_dependent_on(Task.__table__)  # type: ignore
+for statement in TASK_COUNTS_DDL:
+    event.listen(TaskCount.__table__, "after_create", DDL(statement))
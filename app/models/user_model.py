@@ -2,7 +2,7 @@ from datetime import datetime
 from uuid import uuid4
 
 from core.database import Base
-from sqlalchemy import Column, DateTime, String, BOOLEAN
+from sqlalchemy import Column, DateTime, Index, String, BOOLEAN, func
 from sqlalchemy.orm import relationship
 
 
@@ -21,6 +21,11 @@ class User(Base):
         onupdate=lambda: datetime.now(),
     )
 
+    __table_args__ = (
+        # Emails are unique regardless of case
+        Index("ix_users_email_lower", func.lower(email), unique=True),
+    )
+
     # Relationship to tasks owned by this user
     tasks = relationship(
         "Task",
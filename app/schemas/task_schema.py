@@ -1,5 +1,8 @@
 from datetime import date
-from pydantic import BaseModel, field_validator, model_validator
+from enum import Enum
+from pydantic import BaseModel, Field, field_validator, model_validator
+from pydantic_core import to_json
+from core.config import Config
 from models.task_model import TaskStatus
 from .user_schema import ShowUser
 
@@ -56,13 +59,130 @@ class TaskUpdate(BaseModel):
         return self
 
 
+class TaskPatch(BaseModel):
+    """Partial update: only the fields present in the request are written"""
+
+    title: str | None = None
+    description: str | None = None
+    status: TaskStatus | None = None
+    due_date: date | None = None
+
+    @field_validator("due_date")  # type: ignore
+    def parse_due_date(cls, v):
+        if v is None:
+            return None
+        if isinstance(v, date):
+            return v
+        if isinstance(v, str):
+            try:
+                return date.fromisoformat(v)
+            except Exception:
+                raise ValueError("due_date must be a valid ISO 8601 date: YYYY-MM-DD")
+        raise ValueError("due_date must be a date or ISO-8601 string")
+
+    @model_validator(mode="after")
+    def check_fields(self):
+        for field in ("title", "status"):
+            if field in self.model_fields_set and getattr(self, field) is None:
+                raise ValueError(f"{field} cannot be null")
+        if self.due_date is not None and self.due_date < date.today():
+            raise ValueError("due_date must be today or a future date")
+        return self
+
+
+class TaskSortField(str, Enum):
+    due_date = "due_date"
+    created_at = "created_at"
+
+
+class TaskFileFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
 class TaskResponse(BaseModel):
     id: str
     title: str
     description: str | None = None
     status: TaskStatus
     due_date: date | None = None
+    version: int
     owner: ShowUser
 
     class Config:
         from_attributes = True
+
+
+# TaskResponse fields other than owner, in declaration order
+_TASK_ROW_FIELDS = tuple(name for name in TaskResponse.model_fields if name != "owner")
+
+
+def dump_task_rows(rows, owner: ShowUser) -> bytes:
+    """Serialize query rows as ``list[TaskResponse]`` JSON, skipping validation
+
+    Each row must start with the TaskResponse columns in declaration order
+    (extra trailing columns are ignored). Rows come straight from the
+    database, so re-validating them, and the owner's EmailStr on every
+    item, is wasted work; pydantic-core's JSON encoder writes the bytes.
+    """
+    owner_json = {"username": owner.username, "email": owner.email}
+    items = []
+    for row in rows:
+        item = dict(zip(_TASK_ROW_FIELDS, row))
+        item["owner"] = owner_json
+        items.append(item)
+    return to_json(items)
+
+
+class TaskBatchUpdateItem(TaskUpdate):
+    id: str
+
+
+class TaskBatchCreate(BaseModel):
+    items: list[TaskCreate] = Field(min_length=1, max_length=Config.TASKS_MAX_BATCH_SIZE)
+
+
+class TaskBatchUpdate(BaseModel):
+    items: list[TaskBatchUpdateItem] = Field(
+        min_length=1, max_length=Config.TASKS_MAX_BATCH_SIZE
+    )
+
+
+class TaskBatchDelete(BaseModel):
+    ids: list[str] = Field(min_length=1, max_length=Config.TASKS_MAX_BATCH_SIZE)
+
+
+class TaskBatchItemResult(BaseModel):
+    index: int
+    status_code: int
+    id: str | None = None
+    task: TaskResponse | None = None
+    detail: str | None = None
+
+
+class TaskBatchResponse(BaseModel):
+    results: list[TaskBatchItemResult]
+
+
+class TaskChangesResponse(BaseModel):
+    tasks: list[TaskResponse]
+    deleted: list[str]
+    cursor: str
+
+
+class TaskImportResponse(BaseModel):
+    imported: int
+    # Rows whose title the user already has
+    skipped: int
+
+
+class TaskStats(BaseModel):
+    total: int
+    todo: int
+    in_progress: int
+    done: int
+    cancelled: int
+    # Open (todo or in progress) tasks past their due date
+    overdue: int
+    # Open tasks due within the next 7 days, today included
+    due_this_week: int
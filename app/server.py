@@ -0,0 +1,303 @@
+"""Production server: a supervisor process forking uvicorn workers
+
+Run from the app directory (Linux/macOS, it relies on fork)::
+
+    python -m server [--workers N] [--host HOST] [--port PORT] [--no-preload]
+
+* Workers: WEB_CONCURRENCY if set, otherwise one per CPU available to the
+  container, capped so each gets WORKER_MEMORY_MB of memory. The count is
+  exported as WEB_CONCURRENCY before the app reads its Config, which
+  splits DB_MAX_CONNECTIONS, the threadpool and the password hashing
+  processes across the workers.
+* Preloading: the app is imported once here and workers are forked from
+  it, so they start almost instantly and share its memory until they write
+  to it. Importing the app opens no connections, so none cross the fork.
+* Recycling: each worker exits gracefully after MAX_REQUESTS plus up to
+  MAX_REQUESTS_JITTER requests and is replaced.
+* SIGHUP replaces the workers one at a time, stopping each only once its
+  replacement is serving. With --no-preload workers import the app
+  themselves, so a HUP also picks up new code.
+* SIGTERM/SIGINT stop the workers, giving in-flight requests
+  GRACEFUL_TIMEOUT_SECONDS to finish.
+* Metrics: workers pool their samples in METRICS_DIR (a temporary
+  directory by default), so /metrics covers all of them whichever one
+  answers. The supervisor folds in the samples of each worker it reaps.
+"""
+
+from pathlib import Path
+import argparse
+import logging
+import os
+import random
+import select
+import shutil
+import signal
+import socket
+import tempfile
+import time
+
+from dotenv import load_dotenv
+import psutil
+import uvicorn
+
+logger = logging.getLogger("server")
+
+# Workers that exit sooner than this after starting are restarted with a
+# delay, so a crashing app doesn't fork in a tight loop
+_CRASH_WINDOW_SECONDS = 5
+_READY_TIMEOUT_SECONDS = 60
+
+
+def _available_cpus() -> float:
+    if hasattr(os, "sched_getaffinity"):
+        cpus = float(len(os.sched_getaffinity(0)))
+    else:
+        cpus = float(os.cpu_count() or 1)
+    # A cgroup v2 quota such as "200000 100000" (2 CPUs) caps containers
+    try:
+        quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()
+        if quota != "max":
+            cpus = min(cpus, int(quota) / int(period))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def _available_memory() -> int:
+    memory = psutil.virtual_memory().total
+    try:
+        limit = Path("/sys/fs/cgroup/memory.max").read_text().strip()
+        if limit != "max":
+            memory = min(memory, int(limit))
+    except (OSError, ValueError):
+        pass
+    return memory
+
+
+def default_workers() -> int:
+    """One worker per available CPU, as many as memory allows
+
+    Read straight from the environment: it has to be known before
+    core.config is imported.
+    """
+    worker_memory = int(os.getenv("WORKER_MEMORY_MB", "256")) * 1024 * 1024
+    by_cpu = max(1, round(_available_cpus()))
+    by_memory = max(1, _available_memory() // worker_memory)
+    return min(by_cpu, by_memory)
+
+
+class _WorkerServer(uvicorn.Server):
+    """uvicorn server that tells the supervisor once it is serving"""
+
+    def __init__(self, config: uvicorn.Config, ready_fd: int):
+        super().__init__(config)
+        self.ready_fd = ready_fd
+
+    async def startup(self, sockets=None) -> None:
+        await super().startup(sockets=sockets)
+        if self.started:
+            try:
+                os.write(self.ready_fd, b"1")
+            except OSError:
+                pass  # nobody is waiting for this worker
+        os.close(self.ready_fd)
+
+
+class Supervisor:
+    def __init__(self, app, sock, workers: int):
+        from core import metrics
+        from core.config import Config
+
+        # The app object when preloading, or "main:app" for each worker to import
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.config = Config
+        self.metrics = metrics
+        if Config.METRICS_DIR:
+            metrics.share(Config.METRICS_DIR)
+        self.children: dict[int, float] = {}  # pid -> start time
+        self.retiring: dict[int, float] = {}  # pid -> SIGKILL deadline
+        self.signals: list[int] = []
+
+    def spawn(self) -> tuple[int, int]:
+        """Fork a worker. Returns its pid and a pipe that becomes readable
+        once it serves (or closes if it dies first)"""
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            code = 1
+            try:
+                self._serve(write_fd)
+                code = 0
+            except BaseException:
+                logger.exception("Worker failed")
+            finally:
+                os._exit(code)
+        os.close(write_fd)
+        self.children[pid] = time.monotonic()
+        return pid, read_fd
+
+    def _serve(self, ready_fd: int) -> None:
+        # Drop the supervisor's handlers; uvicorn installs its own for
+        # SIGINT/SIGTERM, and a HUP is only meant for the supervisor
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, signal.SIG_DFL)
+        random.seed()  # forked workers would otherwise share the state
+
+        limit = None
+        if self.config.MAX_REQUESTS:
+            limit = self.config.MAX_REQUESTS + random.randint(
+                0, self.config.MAX_REQUESTS_JITTER
+            )
+        config = uvicorn.Config(
+            self.app,
+            limit_max_requests=limit,
+            timeout_graceful_shutdown=int(self.config.GRACEFUL_TIMEOUT_SECONDS),
+            proxy_headers=True,
+        )
+        _WorkerServer(config, ready_fd).run(sockets=[self.sock])
+
+    @staticmethod
+    def wait_ready(read_fd: int, timeout: float = _READY_TIMEOUT_SECONDS) -> bool:
+        try:
+            readable, _, _ = select.select([read_fd], [], [], timeout)
+            return bool(readable) and os.read(read_fd, 1) == b"1"
+        finally:
+            os.close(read_fd)
+
+    def retire(self, pid: int) -> None:
+        """Ask a worker to finish its requests and exit"""
+        self.children.pop(pid, None)
+        self.retiring[pid] = (
+            time.monotonic() + self.config.GRACEFUL_TIMEOUT_SECONDS + 5
+        )
+        _kill(pid, signal.SIGTERM)
+
+    def reap(self) -> None:
+        """Collect exited workers, replacing those that weren't retired"""
+        while self.children or self.retiring:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                break
+            self.metrics.merge_exited(pid)
+            if self.retiring.pop(pid, None) is not None:
+                continue
+            started = self.children.pop(pid, None)
+            if started is None:
+                continue
+
+            code = os.waitstatus_to_exitcode(status)
+            if code == 0:
+                logger.info(f"Worker {pid} exited after its request limit")
+            else:
+                logger.warning(f"Worker {pid} exited with code {code}")
+            if time.monotonic() - started < _CRASH_WINDOW_SECONDS:
+                time.sleep(1)
+            os.close(self.spawn()[1])
+
+        now = time.monotonic()
+        for pid, deadline in list(self.retiring.items()):
+            if now > deadline:
+                logger.warning(f"Worker {pid} did not stop in time, killing it")
+                _kill(pid, signal.SIGKILL)
+                self.retiring[pid] = float("inf")
+
+    def reload(self) -> None:
+        logger.info("Replacing workers")
+        for old_pid in list(self.children):
+            pid, read_fd = self.spawn()
+            if not self.wait_ready(read_fd):
+                logger.error(
+                    f"Replacement worker {pid} did not start, "
+                    "keeping the remaining workers"
+                )
+                return
+            self.retire(old_pid)
+
+    def run(self) -> None:
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(sig, lambda sig, frame: self.signals.append(sig))
+
+        pending = [self.spawn()[1] for _ in range(self.workers)]
+        ready = sum(self.wait_ready(read_fd) for read_fd in pending)
+        logger.info(f"{ready} of {self.workers} workers serving")
+
+        while True:
+            while self.signals:
+                sig = self.signals.pop(0)
+                if sig == signal.SIGHUP:
+                    self.reload()
+                else:
+                    self.stop()
+                    return
+            self.reap()
+            time.sleep(0.1)
+
+    def stop(self) -> None:
+        logger.info("Stopping workers")
+        for pid in list(self.children):
+            self.retire(pid)
+        while self.retiring:
+            self.reap()
+            time.sleep(0.1)
+
+
+def _kill(pid: int, sig: int) -> None:
+    try:
+        os.kill(pid, sig)
+    except ProcessLookupError:
+        pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument(
+        "--no-preload",
+        dest="preload",
+        action="store_false",
+        help="import the app in each worker instead of once before forking",
+    )
+    args = parser.parse_args()
+
+    load_dotenv()
+    if args.workers:
+        os.environ["WEB_CONCURRENCY"] = str(args.workers)
+    workers = int(os.environ.setdefault("WEB_CONCURRENCY", str(default_workers())))
+    # Samples left by a previous run would be counted again
+    metrics_dir = os.environ.get("METRICS_DIR")
+    own_metrics_dir = not metrics_dir
+    if own_metrics_dir:
+        metrics_dir = os.environ["METRICS_DIR"] = tempfile.mkdtemp(
+            prefix="task-flow-metrics-"
+        )
+    else:
+        for path in Path(metrics_dir).glob("*.json"):
+            path.unlink()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.preload:
+        from main import app
+    else:
+        app = "main:app"
+
+    sock = uvicorn.Config(app, host=args.host, port=args.port).bind_socket()
+    # Accepted connections inherit this. Without it small responses wait on
+    # Nagle's algorithm and the client's delayed ACK (~40ms per request);
+    # asyncio only sets it on listeners it creates itself
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    logger.info(f"Starting {workers} workers (preload={args.preload})")
+    try:
+        Supervisor(app, sock, workers).run()
+    finally:
+        if own_metrics_dir:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
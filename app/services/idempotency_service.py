@@ -0,0 +1,167 @@
+"""Idempotency-Key support for task writes
+
+A write sent with an ``Idempotency-Key`` first claims the key by inserting
+a row into ``idempotency_keys``. The write service then runs on a session
+that joins the same transaction without committing it, and its response
+is stored in the claimed row before the one commit. A duplicate that
+arrives meanwhile waits on the row's primary key until that commit, then
+finds the key taken and is served the stored response. So the write runs
+once however many copies arrive. If the first attempt rolls back, its
+claim goes with it and the duplicate runs the write itself.
+"""
+
+from dataclasses import dataclass
+from datetime import timedelta
+import hashlib
+import json
+from typing import Any, Callable
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+from sqlalchemy import delete, func, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from core.config import Config
+from core.metrics import IDEMPOTENT_REQUESTS
+from models.idempotency_model import IdempotencyKey
+from schemas.user_schema import UserResponse
+
+
+@dataclass(frozen=True)
+class Replay:
+    """Stored response of an earlier request with the same key"""
+
+    status_code: int
+    body: Any
+
+
+def request_fingerprint(*parts) -> bytes:
+    """SHA-256 of the parts identifying a request: route, ids and body"""
+    return hashlib.sha256(
+        json.dumps(parts, sort_keys=True, default=str).encode()
+    ).digest()
+
+
+def _key_filter(user_id: str, key: str):
+    return (IdempotencyKey.owner_id == user_id, IdempotencyKey.key == key)
+
+
+def _stored_response(db: Session, user_id: str, key: str, fingerprint: bytes) -> Replay:
+    row = db.execute(
+        select(
+            IdempotencyKey.request_hash,
+            IdempotencyKey.status_code,
+            IdempotencyKey.response,
+        ).where(*_key_filter(user_id, key))
+    ).one_or_none()
+
+    if row is not None and row.request_hash != fingerprint:
+        IDEMPOTENT_REQUESTS.inc("mismatch")
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            detail="Idempotency-Key was already used for a different request",
+        )
+    # The claim commits with its response, so a row without one is only
+    # seen if it was pruned between the two statements
+    if row is None or row.status_code is None:
+        IDEMPOTENT_REQUESTS.inc("in_progress")
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A request with this Idempotency-Key is still in progress",
+            headers={"Retry-After": "1"},
+        )
+    IDEMPOTENT_REQUESTS.inc("replayed")
+    return Replay(row.status_code, row.response)
+
+
+def _store_response(
+    db: Session, user_id: str, key: str, status_code: int, body
+) -> None:
+    db.execute(
+        update(IdempotencyKey)
+        .where(*_key_filter(user_id, key))
+        .values(status_code=status_code, response=body)
+    )
+    db.commit()
+
+
+def run_idempotent(
+    key: str,
+    fingerprint: bytes,
+    write: Callable,
+    *args,
+    db: Session,
+    user: UserResponse,
+    response_model: type[BaseModel],
+    status_code: int = status.HTTP_200_OK,
+    **kwargs,
+):
+    """Call ``write(*args, db=db, user=user, **kwargs)`` at most once per
+    user and key
+
+    Returns the write's result, or a Replay of the response the first
+    request with this key got. Errors the write raises as HTTPException are
+    stored and replayed too, unless the write rolled back. Raises 422 if
+    the key was used for a request with a different fingerprint, and 409
+    if that request hasn't finished.
+    """
+    claim = (
+        insert(IdempotencyKey)
+        .values(owner_id=user.id, key=key, request_hash=fingerprint)
+        .on_conflict_do_nothing()
+        .returning(IdempotencyKey.owner_id)
+    )
+    if db.scalar(claim) is None:
+        return _stored_response(db, user.id, key, fingerprint)
+    IDEMPOTENT_REQUESTS.inc("executed")
+
+    # The service's commit() leaves the claim's transaction open; its
+    # rollback() rolls the claim back with it
+    write_db = Session(
+        bind=db.connection(), join_transaction_mode="rollback_only", autoflush=False
+    )
+    try:
+        result = write(*args, db=write_db, user=user, **kwargs)
+    except HTTPException as e:
+        if not db.in_transaction() or not db.connection().in_transaction():
+            raise  # rolled back, claim included: a retry runs the write again
+        _store_response(db, user.id, key, e.status_code, {"detail": e.detail})
+        raise
+    finally:
+        write_db.close()
+    body = response_model.model_validate(result).model_dump(mode="json")
+    _store_response(db, user.id, key, status_code, body)
+    return result
+
+
+def prune_idempotency_keys(
+    db: Session,
+    ttl_hours: float = Config.IDEMPOTENCY_KEY_TTL_HOURS,
+    batch_size: int = Config.CLEANUP_BATCH_SIZE,
+):
+    """Delete idempotency keys older than ``ttl_hours``
+
+    Returns:
+        int: Number of keys deleted
+    """
+    expired = IdempotencyKey.created_at < func.now() - timedelta(hours=ttl_hours)
+    total = 0
+
+    while True:
+        batch_keys = (
+            select(IdempotencyKey.owner_id, IdempotencyKey.key)
+            .where(expired)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        deleted = db.execute(
+            delete(IdempotencyKey).where(
+                tuple_(IdempotencyKey.owner_id, IdempotencyKey.key).in_(batch_keys)
+            )
+        ).rowcount
+        db.commit()
+
+        total += deleted
+        if deleted < batch_size:
+            return total
@@ -1,41 +1,300 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from models.task_model import Task, TaskStatus
-from schemas.task_schema import TaskCreate, TaskUpdate
+from sqlalchemy.orm import Session, aliased, joinedload
+from sqlalchemy import (
+    Date,
+    Integer,
+    String,
+    Text,
+    cast,
+    column,
+    delete,
+    and_,
+    func,
+    literal,
+    or_,
+    select,
+    table,
+    text,
+    tuple_,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from core.config import Config
+from core.events import TASK_CHANNEL
+from models.task_model import (
+    Task,
+    TaskCount,
+    TaskStatus,
+    TaskTombstone,
+    default_due_date,
+)
+from schemas.task_schema import (
+    TaskBatchUpdateItem,
+    TaskCreate,
+    TaskFileFormat,
+    TaskPatch,
+    TaskSortField,
+    TaskUpdate,
+)
+from models.user_model import User
 from schemas.user_schema import UserResponse
 from fastapi import HTTPException, status
-from datetime import datetime
+from pydantic import ValidationError
+from datetime import date, datetime, timedelta
+import base64
+import csv
+import hashlib
+import io
+import json
+import logging
+import time
+from typing import Callable, Iterable, Iterator
+from uuid import uuid4
+
+logger = logging.getLogger(__name__)
+
+
+def _task_query(db: Session):
+    """Query tasks with their owner joined in, so serializing
+    ``TaskResponse.owner`` never lazy-loads ``users`` row by row"""
+    return db.query(Task).options(joinedload(Task.owner, innerjoin=True))
+
+
+# Columns returned by writes; together with the caller as owner they make
+# up a TaskResponse, so no follow-up SELECT is needed
+_RETURNED_COLUMNS = (
+    Task.id,
+    Task.title,
+    Task.description,
+    Task.status,
+    Task.due_date,
+    Task.version,
+)
+
+
+def _returned_task(row, user: UserResponse) -> dict:
+    task = {column.key: getattr(row, column.key) for column in _RETURNED_COLUMNS}
+    return {**task, "owner": user}
+
+
+def _notify_owner(owner_id_column):
+    """pg_notify() for a RETURNING clause: wakes the owner's open task
+    streams when the write commits, without another round trip"""
+    return func.pg_notify(TASK_CHANNEL, owner_id_column).label("notified")
+
+
+def _version_conflict_error() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Task was modified by another request",
+    )
+
+
+def _missing_task_error(id: str, db: Session, user: UserResponse) -> HTTPException:
+    """Tell a missing task from someone else's, or from a stale version,
+    after a scoped write matched no row. Only the failure path pays for
+    this extra SELECT"""
+    owner_id = db.scalar(select(Task.owner_id).where(Task.id == id))
+    if owner_id is None:
+        return HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Task not found"
+        )
+    if owner_id != user.id:
+        return HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authorized"
+        )
+    return _version_conflict_error()
 
 
 def create_task(task: TaskCreate, db: Session, user: UserResponse):
-    existing_task = db.query(Task).filter(Task.title == task.title).first()
-    if existing_task:
+    # A one-item batch: a single INSERT ... ON CONFLICT DO NOTHING RETURNING,
+    # with the per-owner unique title constraint doing the duplicate check
+    [result] = create_tasks([task], db, user)
+    if result["status_code"] != status.HTTP_201_CREATED:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="A task with this title already exists",
+            status_code=result["status_code"], detail=result["detail"]
+        )
+    return result["task"]
+
+
+def _encode_cursor(value: date | datetime | None, id: str) -> str:
+    payload = json.dumps([value.isoformat() if value else None, id])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def _decode_cursor(cursor: str, sort_by: TaskSortField):
+    try:
+        value, id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if value is not None:
+            parse = date if sort_by == TaskSortField.due_date else datetime
+            value = parse.fromisoformat(value)
+        return value, str(id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
         )
 
-    new_task = Task(
-        title=task.title,
-        description=task.description,
-        status=task.status,
-        due_date=task.due_date,
-        owner_id=user.id,
+
+def _filter_tasks(
+    query,
+    task_status: TaskStatus | None,
+    due_from: date | None,
+    due_to: date | None,
+    title_prefix: str | None,
+):
+    if task_status is not None:
+        query = query.filter(Task.status == task_status)
+    if due_from is not None:
+        query = query.filter(Task.due_date >= due_from)
+    if due_to is not None:
+        query = query.filter(Task.due_date <= due_to)
+    if title_prefix:
+        escaped = (
+            title_prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        )
+        query = query.filter(Task.title.like(f"{escaped}%", escape="\\"))
+    return query
+
+
+def fetch_my_tasks(
+    db: Session,
+    user: UserResponse,
+    limit: int = Config.TASKS_PAGE_SIZE,
+    cursor: str | None = None,
+    sort_by: TaskSortField = TaskSortField.created_at,
+    task_status: TaskStatus | None = None,
+    due_from: date | None = None,
+    due_to: date | None = None,
+    title_prefix: str | None = None,
+    as_rows: bool = False,
+):
+    """Fetch one page of the user's tasks ordered by ``(sort_by, id)``
+
+    Pages are keyset-based: the cursor holds the sort key of the last row
+    returned, so every page is a bounded index range scan regardless of
+    how many tasks the user owns. Rows without a sort value come last.
+
+    With ``as_rows`` the page holds plain row tuples of the TaskResponse
+    columns instead of Task objects, and the owner isn't joined (it is
+    always ``user``).
+
+    Returns:
+        tuple[list, str | None]: The page and the cursor for the next one
+    """
+    sort_column = getattr(Task, sort_by.value)
+    if as_rows:
+        query = db.query(*_RETURNED_COLUMNS, Task.created_at)
+    else:
+        query = _task_query(db)
+    query = _filter_tasks(
+        query.filter(Task.owner_id == user.id),
+        task_status,
+        due_from,
+        due_to,
+        title_prefix,
     )
-    db.add(new_task)
-    db.commit()
-    db.refresh(new_task)
 
-    return new_task
+    if cursor:
+        last_value, last_id = _decode_cursor(cursor, sort_by)
+        if last_value is None:
+            # Already inside the trailing block of rows without a sort value
+            query = query.filter(sort_column.is_(None), Task.id > last_id)
+        else:
+            query = query.filter(
+                or_(
+                    tuple_(sort_column, Task.id) > tuple_(last_value, last_id),
+                    sort_column.is_(None),
+                )
+            )
+
+    # Fetch one extra row to learn whether another page exists
+    db_tasks = (
+        query.order_by(sort_column.asc().nulls_last(), Task.id.asc())
+        .limit(limit + 1)
+        .all()
+    )
+
+    next_cursor = None
+    if len(db_tasks) > limit:
+        db_tasks = db_tasks[:limit]
+        last_task = db_tasks[-1]
+        next_cursor = _encode_cursor(getattr(last_task, sort_by.value), last_task.id)  # type: ignore
+    return db_tasks, next_cursor
+
+
+def my_tasks_etag(
+    db: Session,
+    user: UserResponse,
+    limit: int = Config.TASKS_PAGE_SIZE,
+    cursor: str | None = None,
+    sort_by: TaskSortField = TaskSortField.created_at,
+    task_status: TaskStatus | None = None,
+    due_from: date | None = None,
+    due_to: date | None = None,
+    title_prefix: str | None = None,
+) -> str:
+    """Strong ETag for a page of ``fetch_my_tasks``, from one aggregate query
+
+    Every write bumps a task's version and ``updated_at`` and inserts or
+    deletes change the count, so ``count``, ``max(updated_at)`` and
+    ``sum(version)`` over the filtered tasks change whenever the page can.
+    Each task also carries its owner's username and email, read in the same
+    query. The page parameters are hashed in as well.
+    """
+    is_owner = User.id == user.id
+    query = _filter_tasks(
+        db.query(
+            func.count(Task.id),
+            func.max(Task.updated_at),
+            func.coalesce(func.sum(Task.version), 0),
+            select(User.username).where(is_owner).scalar_subquery(),
+            select(User.email).where(is_owner).scalar_subquery(),
+        ).filter(Task.owner_id == user.id),
+        task_status,
+        due_from,
+        due_to,
+        title_prefix,
+    )
+    count, last_updated, version_sum, username, email = query.one()
+    fingerprint = json.dumps(
+        [
+            user.id,
+            limit,
+            cursor,
+            sort_by.value,
+            task_status.value if task_status else None,
+            due_from.isoformat() if due_from else None,
+            due_to.isoformat() if due_to else None,
+            title_prefix,
+            count,
+            last_updated.isoformat() if last_updated else None,
+            int(version_sum),
+            username,
+            email,
+        ]
+    )
+    return '"' + hashlib.sha256(fingerprint.encode()).hexdigest()[:32] + '"'
 
 
-def fetch_my_tasks(db: Session, user: UserResponse):
-    db_tasks = db.query(Task).filter(Task.owner_id == user.id).all()
-    return db_tasks
+def fetch_task_version(id: str, db: Session, user: UserResponse) -> int:
+    """Current version of one of the caller's tasks, without loading it"""
+    row = db.execute(
+        select(Task.owner_id, Task.version).where(Task.id == id)
+    ).one_or_none()
+    if row is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Task not found"
+        )
+    if row.owner_id != user.id:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authorized"
+        )
+    return row.version
 
 
 def fetch_task(id: str, db: Session, user: UserResponse):
-    db_task = db.query(Task).filter(Task.id == id).first()
+    db_task = _task_query(db).filter(Task.id == id).first()
     if not db_task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Task not found"
@@ -48,49 +307,807 @@ def fetch_task(id: str, db: Session, user: UserResponse):
     return db_task
 
 
-def update_task(id: str, task: TaskUpdate, db: Session, user: UserResponse):
-    task_query = db.query(Task).filter(Task.id == id)
-    db_task = task_query.first()
+def _apply_changes(
+    id: str,
+    changes: dict,
+    db: Session,
+    user: UserResponse,
+    expected_version: int | None,
+):
+    """Write ``changes`` to one of the caller's tasks and bump its version
 
-    if not db_task:
+    Only the given columns appear in the UPDATE. With ``expected_version``
+    the write is conditional on the stored version, so a client holding a
+    stale copy gets a 409 instead of overwriting someone else's edit.
+    """
+    conditions = [Task.id == id, Task.owner_id == user.id]
+    if expected_version is not None:
+        conditions.append(Task.version == expected_version)
+
+    stmt = (
+        update(Task)
+        .where(*conditions)
+        .values(**changes, version=Task.version + 1)
+        .returning(*_RETURNED_COLUMNS, _notify_owner(Task.owner_id))
+        .execution_options(synchronize_session=False)
+    )
+    try:
+        row = db.execute(stmt).one_or_none()
+        db.commit()
+    except IntegrityError:
+        db.rollback()
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Task not found"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="A task with this title already exists",
         )
 
-    if db_task.owner_id != user.id:  # type: ignore
+    if row is None:
+        raise _missing_task_error(id, db, user)
+    return _returned_task(row, user)
+
+
+def update_task(
+    id: str,
+    task: TaskUpdate,
+    db: Session,
+    user: UserResponse,
+    expected_version: int | None = None,
+):
+    changes = task.model_dump()
+    # status is NOT NULL; an explicit null keeps the current value
+    if changes["status"] is None:
+        del changes["status"]
+    return _apply_changes(id, changes, db, user, expected_version)
+
+
+def patch_task(
+    id: str,
+    task: TaskPatch,
+    db: Session,
+    user: UserResponse,
+    expected_version: int | None = None,
+):
+    changes = task.model_dump(exclude_unset=True)
+    if not changes:
+        # Nothing to write, so don't bump the version either
+        db_task = fetch_task(id, db, user)
+        if expected_version is not None and db_task.version != expected_version:
+            raise _version_conflict_error()
+        return db_task
+    return _apply_changes(id, changes, db, user, expected_version)
+
+
+def _delete_with_tombstones(*conditions):
+    """Delete the matching tasks and record a tombstone for each, in one
+    statement. RETURNING yields the deleted task ids"""
+    deleted = (
+        delete(Task)
+        .where(*conditions)
+        .returning(Task.id, Task.owner_id)
+        .cte("deleted")
+    )
+    return (
+        insert(TaskTombstone)
+        .from_select(
+            ["task_id", "owner_id"], select(deleted.c.id, deleted.c.owner_id)
+        )
+        .returning(TaskTombstone.task_id, _notify_owner(TaskTombstone.owner_id))
+    )
+
+
+def delete_task(id: str, db: Session, user: UserResponse):
+    stmt = _delete_with_tombstones(Task.id == id, Task.owner_id == user.id)
+    deleted = db.execute(stmt).scalar()
+    db.commit()
+
+    if deleted is None:
+        raise _missing_task_error(id, db, user)
+
+
+def _encode_sync_cursor(snapshot: str, issued_at: datetime) -> str:
+    payload = json.dumps([snapshot, issued_at.isoformat()])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def _decode_sync_cursor(cursor: str) -> tuple[str, datetime]:
+    try:
+        snapshot, issued_at = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        xmin, xmax, xip = snapshot.split(":")
+        for xid in (xmin, xmax, *xip.split(",")):
+            if xid:
+                int(xid)
+        issued_at = datetime.fromisoformat(issued_at)
+        if issued_at.tzinfo is None:
+            raise ValueError("naive issued_at")
+        return snapshot, issued_at
+    except (ValueError, TypeError, AttributeError):
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authorized"
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+
+def _changed_since(xid_column, snapshot: str):
+    """Rows written by transactions that ``snapshot`` could not see
+
+    A pg_snapshot reads ``xmin:xmax:xip``; a transaction is visible to it
+    when its id is below xmax and not in the in-progress list xip.
+    """
+    _, xmax, xip = snapshot.split(":")
+    in_progress = [int(xid) for xid in xip.split(",") if xid]
+    condition = xid_column >= int(xmax)
+    if in_progress:
+        condition = or_(condition, xid_column.in_(in_progress))
+    return condition
+
+
+def fetch_task_changes(db: Session, user: UserResponse, since: str | None = None):
+    """Tasks created or updated, and ids of tasks deleted, since ``since``
+
+    The cursor wraps the database snapshot taken at the start of the
+    previous sync, so a transaction that was still running then is picked
+    up by the next sync whenever it commits. Without ``since`` every task
+    is returned. Changes are delivered at least once; clients apply them
+    as upserts.
+
+    Returns:
+        dict: A TaskChangesResponse
+    """
+    # Taken first: anything the queries below see that this snapshot
+    # doesn't is simply delivered again next time
+    snapshot, now = db.execute(
+        select(cast(func.pg_current_snapshot(), Text), func.now())
+    ).one()
+
+    last_snapshot = None
+    if since:
+        last_snapshot, issued_at = _decode_sync_cursor(since)
+        if issued_at < now - timedelta(days=Config.TOMBSTONE_RETENTION_DAYS):
+            raise HTTPException(
+                status_code=status.HTTP_410_GONE,
+                detail="Sync cursor expired, sync again without since",
+            )
+
+    query = _task_query(db).filter(Task.owner_id == user.id)
+    if last_snapshot:
+        query = query.filter(_changed_since(Task.change_xid, last_snapshot))
+    tasks = query.order_by(Task.change_xid, Task.id).all()
+
+    deleted = []
+    if last_snapshot:
+        deleted = list(
+            db.scalars(
+                select(TaskTombstone.task_id).where(
+                    TaskTombstone.owner_id == user.id,
+                    _changed_since(TaskTombstone.deleted_xid, last_snapshot),
+                )
+            )
+        )
+
+    return {
+        "tasks": tasks,
+        "deleted": deleted,
+        "cursor": _encode_sync_cursor(snapshot, now),
+    }
+
+
+def fetch_task_stats(db: Session, user: UserResponse, exact: bool = False):
+    """Task counts for the user's dashboard
+
+    Read from the ``task_counts`` buckets, which costs the same however many
+    tasks the user has. ``exact`` counts the tasks themselves instead, as a
+    fallback in case the counters have drifted.
+
+    Returns:
+        dict: A TaskStats
+    """
+    if exact:
+        buckets = (
+            select(Task.status, Task.due_date, func.count().label("count"))
+            .where(Task.owner_id == user.id)
+            .group_by(Task.status, Task.due_date)
+            .subquery()
+        )
+    else:
+        buckets = (
+            select(TaskCount.status, TaskCount.due_date, TaskCount.count)
+            .where(TaskCount.owner_id == user.id)
+            .subquery()
+        )
+
+    today = datetime.now().date()
+    is_open = buckets.c.status.in_([TaskStatus.todo, TaskStatus.in_progress])
+
+    def count_where(*conditions):
+        column = func.sum(buckets.c.count)
+        if conditions:
+            column = column.filter(and_(*conditions))
+        return func.coalesce(column, 0).cast(Integer)
+
+    row = db.execute(
+        select(
+            count_where().label("total"),
+            count_where(buckets.c.status == TaskStatus.todo).label("todo"),
+            count_where(buckets.c.status == TaskStatus.in_progress).label(
+                "in_progress"
+            ),
+            count_where(buckets.c.status == TaskStatus.done).label("done"),
+            count_where(buckets.c.status == TaskStatus.cancelled).label("cancelled"),
+            count_where(is_open, buckets.c.due_date < today).label("overdue"),
+            count_where(
+                is_open,
+                buckets.c.due_date >= today,
+                buckets.c.due_date < today + timedelta(days=7),
+            ).label("due_this_week"),
         )
+    ).one()
+    return row._asdict()
+
 
-    task_query.update(task.model_dump(), synchronize_session=False)  # type: ignore
+def create_tasks(tasks: list[TaskCreate], db: Session, user: UserResponse):
+    """Insert a batch of tasks in one transaction
+
+    A single multi-row ``INSERT ... ON CONFLICT DO NOTHING RETURNING`` does
+    the work. Items missing from RETURNING collided with the unique title
+    constraint, including duplicates within the batch.
+
+    Returns:
+        list[dict]: One TaskBatchItemResult per item, in request order
+    """
+    rows = [
+        {
+            "id": str(uuid4()),
+            "title": task.title,
+            "description": task.description,
+            "status": task.status or TaskStatus.todo,
+            "due_date": task.due_date or default_due_date(),
+            "owner_id": user.id,
+        }
+        for task in tasks
+    ]
+    stmt = (
+        insert(Task)
+        .on_conflict_do_nothing()
+        .returning(*_RETURNED_COLUMNS, _notify_owner(Task.owner_id))
+        # ORM bulk inserts leave out None values and split the batch into
+        # one statement per distinct set of keys; send NULLs instead
+        .execution_options(render_nulls=True)
+    )
+    inserted = {row.id: row for row in db.execute(stmt, rows)}
     db.commit()
-    db.refresh(db_task)
-    return db_task
 
+    results = []
+    for index, row in enumerate(rows):
+        if row["id"] in inserted:
+            task = _returned_task(inserted[row["id"]], user)
+            results.append(
+                {"index": index, "status_code": 201, "id": row["id"], "task": task}
+            )
+        else:
+            results.append(
+                {
+                    "index": index,
+                    "status_code": 400,
+                    "detail": "A task with this title already exists",
+                }
+            )
+    return results
 
-def delete_task(id: str, db: Session, user: UserResponse):
-    db_task = fetch_task(id, db, user)
-    db.delete(db_task)
+
+def update_tasks(items: list[TaskBatchUpdateItem], db: Session, user: UserResponse):
+    """Apply a batch of full updates in one transaction
+
+    All items go out as one ``UPDATE tasks ... FROM (VALUES ...)`` scoped to
+    the caller's tasks. A title held by another of the caller's tasks, as
+    it stood before the batch, or by an earlier item of the batch is a 409
+    for that item; the rest of the batch still applies. Only when some ids
+    are missing from RETURNING does one more SELECT tell those conflicts
+    from tasks that don't exist or belong to someone else.
+
+    Returns:
+        list[dict]: One TaskBatchItemResult per item, in request order
+    """
+    results: list[dict | None] = [None] * len(items)
+    seen_ids: set[str] = set()
+    seen_titles: set[str] = set()
+    for index, item in enumerate(items):
+        if item.id in seen_ids:
+            results[index] = {
+                "index": index,
+                "status_code": 400,
+                "id": item.id,
+                "detail": "Duplicate task id in batch",
+            }
+        elif item.title in seen_titles:
+            results[index] = {
+                "index": index,
+                "status_code": 409,
+                "id": item.id,
+                "detail": "A task with this title already exists",
+            }
+        seen_ids.add(item.id)
+        seen_titles.add(item.title)
+
+    batch = values(
+        column("id", String),
+        column("title", String),
+        column("description", String),
+        column("status", String),
+        column("due_date", Date),
+        name="batch",
+    ).data(
+        [
+            (
+                item.id,
+                item.title,
+                item.description,
+                item.status.value if item.status else None,
+                item.due_date,
+            )
+            for index, item in enumerate(items)
+            if results[index] is None
+        ]
+    )
+    other = aliased(Task)
+    title_taken = (
+        select(other.id)
+        .where(
+            other.owner_id == user.id,
+            other.title == batch.c.title,
+            other.id != batch.c.id,
+        )
+        .exists()
+    )
+    stmt = (
+        update(Task)
+        .where(Task.id == batch.c.id, Task.owner_id == user.id, ~title_taken)
+        .values(
+            title=batch.c.title,
+            description=batch.c.description,
+            # VALUES columns are untyped text; a null status keeps the old one
+            status=func.coalesce(cast(batch.c.status, Task.status.type), Task.status),
+            due_date=cast(batch.c.due_date, Date),
+            version=Task.version + 1,
+        )
+        .returning(*_RETURNED_COLUMNS, _notify_owner(Task.owner_id))
+        .execution_options(synchronize_session=False)
+    )
+    try:
+        updated = {row.id: row for row in db.execute(stmt)}
+        db.commit()
+    except IntegrityError:
+        # Only a title taken by a concurrent write gets this far
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A task with this title already exists",
+        )
+
+    missing = [
+        item.id
+        for index, item in enumerate(items)
+        if results[index] is None and item.id not in updated
+    ]
+    owned = (
+        set(
+            db.scalars(
+                select(Task.id).where(Task.id.in_(missing), Task.owner_id == user.id)
+            )
+        )
+        if missing
+        else set()
+    )
+
+    for index, item in enumerate(items):
+        if results[index] is not None:
+            continue
+        if item.id in updated:
+            task = _returned_task(updated[item.id], user)
+            results[index] = {
+                "index": index,
+                "status_code": 200,
+                "id": item.id,
+                "task": task,
+            }
+        elif item.id in owned:
+            results[index] = {
+                "index": index,
+                "status_code": 409,
+                "id": item.id,
+                "detail": "A task with this title already exists",
+            }
+        else:
+            results[index] = {
+                "index": index,
+                "status_code": 404,
+                "id": item.id,
+                "detail": "Task not found",
+            }
+    return results
+
+
+def delete_tasks(ids: list[str], db: Session, user: UserResponse):
+    """Delete a batch of the caller's tasks with one ``DELETE ... RETURNING``
+
+    A repeated id gets a 400; only its first occurrence reports the delete.
+
+    Returns:
+        list[dict]: One TaskBatchItemResult per id, in request order
+    """
+    stmt = _delete_with_tombstones(Task.id.in_(ids), Task.owner_id == user.id)
+    deleted = set(db.execute(stmt).scalars())
     db.commit()
 
+    results = []
+    seen: set[str] = set()
+    for index, id in enumerate(ids):
+        if id in seen:
+            results.append(
+                {
+                    "index": index,
+                    "status_code": 400,
+                    "id": id,
+                    "detail": "Duplicate task id in batch",
+                }
+            )
+        elif id in deleted:
+            results.append({"index": index, "status_code": 200, "id": id})
+        else:
+            results.append(
+                {"index": index, "status_code": 404, "id": id, "detail": "Task not found"}
+            )
+        seen.add(id)
+    return results
+
+
+_EXPORT_COLUMNS = (
+    Task.id,
+    Task.title,
+    Task.description,
+    Task.status,
+    Task.due_date,
+    Task.version,
+    Task.created_at,
+    Task.updated_at,
+)
+_IMPORT_FIELDS = ("title", "description", "status", "due_date")
+# Validation errors reported by a failed import; reading stops after these
+_MAX_IMPORT_ERRORS = 20
+
+
+def _export_value(value):
+    if isinstance(value, TaskStatus):
+        return value.value
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def export_tasks(
+    db: Session,
+    user: UserResponse,
+    export_format: TaskFileFormat = TaskFileFormat.ndjson,
+    batch_size: int = Config.TASKS_EXPORT_BATCH_SIZE,
+) -> Iterator[str]:
+    """Yield all of the user's tasks as NDJSON or CSV, one chunk per batch
+
+    Rows come from a server-side cursor ``batch_size`` at a time, so memory
+    use doesn't grow with the number of tasks. The cursor reads a single
+    snapshot, which keeps the export consistent.
+    """
+    stmt = (
+        select(*_EXPORT_COLUMNS)
+        .where(Task.owner_id == user.id)
+        .order_by(Task.id)
+        .execution_options(yield_per=batch_size)
+    )
+    names = [column.key for column in _EXPORT_COLUMNS]
+
+    if export_format == TaskFileFormat.csv:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(names)
+        for partition in db.execute(stmt).partitions():
+            writer.writerows(
+                [_export_value(value) for value in row] for row in partition
+            )
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        # The header alone, for a user without tasks
+        if buffer.tell():
+            yield buffer.getvalue()
+        return
+
+    for partition in db.execute(stmt).partitions():
+        yield "".join(
+            json.dumps(dict(zip(names, map(_export_value, row)))) + "\n"
+            for row in partition
+        )
+
+
+class _ChunkStream(io.RawIOBase):
+    """Readable file object over an iterator of byte chunks"""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._pending = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            self._pending = next(self._chunks, b"")
+            if not self._pending:
+                return 0
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
 
-def delete_completed_or_due_tasks(db: Session):
+
+def _read_import_records(chunks: Iterable[bytes], import_format: TaskFileFormat):
+    """Yield ``(line, record)`` pairs from an uploaded NDJSON or CSV body"""
+    text_stream = io.TextIOWrapper(
+        io.BufferedReader(_ChunkStream(chunks)), encoding="utf-8", newline=""
+    )
+    if import_format == TaskFileFormat.csv:
+        reader = csv.DictReader(text_stream)
+        for record in reader:
+            # Empty CSV cells mean "not set"
+            yield reader.line_num, {k: v for k, v in record.items() if v != ""}
+        return
+
+    for line_number, line in enumerate(text_stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield line_number, record
+
+
+def import_tasks(
+    chunks: Iterable[bytes],
+    db: Session,
+    user: UserResponse,
+    import_format: TaskFileFormat = TaskFileFormat.ndjson,
+    max_rows: int = Config.TASKS_MAX_IMPORT_ROWS,
+):
+    """Bulk-load an uploaded NDJSON or CSV file of tasks
+
+    Records are validated against ``TaskCreate`` while the upload streams
+    through ``COPY`` into a temporary staging table, then merged into
+    ``tasks`` with one ``INSERT ... SELECT ... ON CONFLICT DO NOTHING``.
+    Rows whose title the user already has are skipped. Any invalid record
+    fails the whole import with a 422 listing the first errors.
+
+    Returns:
+        dict: A TaskImportResponse
+    """
+    errors: list[dict] = []
+    row_count = 0
+
+    def copy_rows():
+        nonlocal row_count
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for line, record in _read_import_records(chunks, import_format):
+            if row_count >= max_rows:
+                errors.append(
+                    {"line": line, "msg": f"Imports are limited to {max_rows} tasks"}
+                )
+                return
+            try:
+                if not isinstance(record, dict):
+                    raise ValueError("Expected a JSON object")
+                task = TaskCreate(**{k: record[k] for k in _IMPORT_FIELDS if k in record})
+            except (ValueError, TypeError) as e:
+                message = e.errors()[0]["msg"] if isinstance(e, ValidationError) else str(e)
+                errors.append({"line": line, "msg": message})
+                if len(errors) >= _MAX_IMPORT_ERRORS:
+                    return
+                continue
+
+            row_count += 1
+            # Same defaults as create_tasks
+            writer.writerow(
+                [
+                    row_count,
+                    task.title,
+                    task.description,
+                    (task.status or TaskStatus.todo).value,
+                    task.due_date or default_due_date(),
+                ]
+            )
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+
+    db.execute(
+        text(
+            "CREATE TEMP TABLE task_import (line integer, title text,"
+            " description text, status text, due_date date) ON COMMIT DROP"
+        )
+    )
+    # COPY needs the driver connection; the import always runs on psycopg2
+    cursor = db.connection().connection.driver_connection.cursor()
+    cursor.copy_expert(
+        "COPY task_import FROM STDIN WITH (FORMAT csv)", _ChunkStream(copy_rows())
+    )
+    if errors:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT, detail=errors
+        )
+
+    staging = table(
+        "task_import",
+        column("line"),
+        column("title"),
+        column("description"),
+        column("status"),
+        column("due_date"),
+    )
+    now = datetime.now()
+    merge = (
+        insert(Task)
+        .from_select(
+            [
+                "id",
+                "title",
+                "description",
+                "status",
+                "due_date",
+                "owner_id",
+                "created_at",
+                "updated_at",
+            ],
+            select(
+                cast(func.gen_random_uuid(), String),
+                staging.c.title,
+                staging.c.description,
+                cast(staging.c.status, Task.status.type),
+                staging.c.due_date,
+                literal(user.id),
+                literal(now),
+                literal(now),
+            ).order_by(staging.c.line),
+        )
+        .on_conflict_do_nothing()
+    )
+    imported = db.execute(merge).rowcount
+    if imported:
+        db.execute(select(func.pg_notify(TASK_CHANNEL, user.id)))
+    db.commit()
+
+    return {"imported": imported, "skipped": row_count - imported}
+
+
+def delete_completed_or_due_tasks(
+    db: Session,
+    batch_size: int = Config.CLEANUP_BATCH_SIZE,
+    batch_pause: float = Config.CLEANUP_BATCH_PAUSE_SECONDS,
+    should_stop: Callable[[], bool] | None = None,
+):
     """Delete tasks that are marked as done or have passed their due date
 
+    Rows are removed in set-based batches of at most ``batch_size``, each
+    committed on its own, so memory use and lock hold times stay bounded no
+    matter how many tasks have expired. ``batch_pause`` seconds are slept
+    between batches to leave room for other writers. If ``should_stop``
+    returns True between batches, the remaining rows are left for the next run.
+
     Returns:
         int: Number of tasks deleted
     """
-    tasks_to_delete = (
-        db.query(Task)
-        .filter(
-            or_(Task.status == TaskStatus.done, Task.due_date <= datetime.now().date())
+    expired = or_(Task.status == TaskStatus.done, Task.due_date <= datetime.now().date())
+    total = 0
+
+    while True:
+        batch_ids = (
+            select(Task.id)
+            .where(expired)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
         )
-        .all()
-    )
+        deleted = len(
+            db.execute(_delete_with_tombstones(Task.id.in_(batch_ids))).all()
+        )
+        db.commit()
+
+        total += deleted
+        logger.info(f"Cleanup batch deleted {deleted} tasks ({total} so far)")
+        if deleted < batch_size:
+            return total
+        if should_stop and should_stop():
+            logger.warning(f"Cleanup stopped early after deleting {total} tasks")
+            return total
+        if batch_pause:
+            time.sleep(batch_pause)
+
+
+def prune_task_tombstones(
+    db: Session,
+    retention_days: int = Config.TOMBSTONE_RETENTION_DAYS,
+    batch_size: int = Config.CLEANUP_BATCH_SIZE,
+):
+    """Delete tombstones older than the sync cursor retention window
+
+    Returns:
+        int: Number of tombstones deleted
+    """
+    expired = TaskTombstone.deleted_at < func.now() - timedelta(days=retention_days)
+    total = 0
+
+    while True:
+        batch_ids = (
+            select(TaskTombstone.task_id)
+            .where(expired)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        deleted = db.execute(
+            delete(TaskTombstone).where(TaskTombstone.task_id.in_(batch_ids))
+        ).rowcount
+        db.commit()
+
+        total += deleted
+        if deleted < batch_size:
+            return total
 
-    count = len(tasks_to_delete)
-    for task in tasks_to_delete:
-        db.delete(task)
 
+def reconcile_task_counts(db: Session) -> int:
+    """Repair drift between ``task_counts`` and the tasks themselves
+
+    Both tables are read in one statement, i.e. from one snapshot, and
+    any difference is added to the counters as a delta. A transaction
+    that commits meanwhile applies its own delta, so the two don't undo
+    each other. Empty buckets are removed afterwards.
+
+    Returns:
+        int: Number of buckets that were corrected
+    """
+    due_bucket = func.coalesce(Task.due_date, cast(literal("infinity"), Date))
+    actual = (
+        select(
+            Task.owner_id,
+            Task.status,
+            due_bucket.label("due_date"),
+            func.count().label("count"),
+        )
+        .group_by(Task.owner_id, Task.status, due_bucket)
+        .cte("actual")
+    )
+    stored = select(TaskCount).cte("stored")
+    matches = and_(
+        actual.c.owner_id == stored.c.owner_id,
+        actual.c.status == stored.c.status,
+        actual.c.due_date == stored.c.due_date,
+    )
+    drift = func.coalesce(actual.c.count, 0) - func.coalesce(stored.c.count, 0)
+    corrections = (
+        select(
+            func.coalesce(actual.c.owner_id, stored.c.owner_id),
+            func.coalesce(actual.c.status, stored.c.status),
+            func.coalesce(actual.c.due_date, stored.c.due_date),
+            drift,
+        )
+        .select_from(actual.join(stored, matches, full=True))
+        .where(drift != 0)
+    )
+    stmt = insert(TaskCount).from_select(
+        ["owner_id", "status", "due_date", "count"], corrections
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[TaskCount.owner_id, TaskCount.status, TaskCount.due_date],
+        set_={"count": TaskCount.count + stmt.excluded.count},
+    )
+    corrected = db.execute(stmt).rowcount
+    db.execute(delete(TaskCount).where(TaskCount.count == 0))
     db.commit()
-    return count
+
+    if corrected:
+        logger.warning(f"Reconciled {corrected} drifted task count buckets")
+    return corrected
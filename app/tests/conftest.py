@@ -0,0 +1,72 @@
+"""Fixtures for tests against the app and a migrated database
+
+The database is the one DATABASE_URL points at, as for the app itself.
+Every user a test registers is deleted with their data at the end of the
+session.
+"""
+
+import os
+import uuid
+
+# Before the app reads its configuration. The tests count statements with
+# count_queries() themselves, which the query budget middleware's own
+# counter would hide
+os.environ["QUERY_BUDGET_CHECKS"] = "false"
+os.environ.setdefault("RUN_BACKGROUND_TASKS", "false")
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+
+from fastapi.testclient import TestClient
+import pytest
+from sqlalchemy import delete, select
+
+from core.database import SessionLocal
+from main import app
+from models.idempotency_model import IdempotencyKey
+from models.task_model import Task, TaskCount, TaskTombstone
+from models.user_model import User
+
+RUN_ID = f"test-{uuid.uuid4().hex[:8]}"
+PASSWORD = "test-password"
+
+
+def _remove_test_users() -> None:
+    owner_ids = select(User.id).where(User.username.startswith(f"{RUN_ID}-"))
+    with SessionLocal() as db:
+        for model in (Task, TaskTombstone, TaskCount, IdempotencyKey):
+            db.execute(delete(model).where(model.owner_id.in_(owner_ids)))
+        db.execute(delete(User).where(User.id.in_(owner_ids)))
+        db.commit()
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as client:
+        yield client
+    _remove_test_users()
+
+
+@pytest.fixture
+def auth_headers(client) -> dict[str, str]:
+    """Authorization header of a newly registered user"""
+    username = f"{RUN_ID}-{uuid.uuid4().hex[:8]}"
+    email = f"{username}@test.example.com"
+    response = client.post(
+        "/api/auth/register",
+        json={"username": username, "email": email, "password": PASSWORD},
+    )
+    assert response.status_code < 300, response.text
+    response = client.post(
+        "/api/auth/login", json={"email": email, "password": PASSWORD}
+    )
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def task(client, auth_headers) -> dict:
+    """A task owned by the auth_headers user"""
+    response = client.post(
+        "/api/tasks/", json={"title": "Test task"}, headers=auth_headers
+    )
+    assert response.status_code == 201, response.text
+    return response.json()
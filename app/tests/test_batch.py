@@ -0,0 +1,48 @@
+"""Batch routes report each item on its own"""
+
+
+def _create(client, headers, *titles) -> list[str]:
+    response = client.post(
+        "/api/tasks/batch",
+        json={"items": [{"title": title} for title in titles]},
+        headers=headers,
+    )
+    return [result["id"] for result in response.json()["results"]]
+
+
+def test_update_title_conflicts_fail_only_their_items(client, auth_headers):
+    first, second, third = _create(client, auth_headers, "One", "Two", "Three")
+
+    response = client.patch(
+        "/api/tasks/batch",
+        json={
+            "items": [
+                {"id": first, "title": "Two"},
+                {"id": second, "title": "New"},
+                {"id": third, "title": "New"},
+                {"id": first, "title": "Again"},
+            ]
+        },
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["status_code"] for result in results] == [409, 200, 409, 400]
+    assert results[1]["task"]["title"] == "New"
+
+    tasks = client.get("/api/tasks/", headers=auth_headers).json()
+    titles = {task["id"]: task["title"] for task in tasks}
+    assert [titles[first], titles[second], titles[third]] == ["One", "New", "Three"]
+
+
+def test_delete_reports_repeated_id_once(client, auth_headers):
+    [id] = _create(client, auth_headers, "Doomed")
+
+    response = client.request(
+        "DELETE",
+        "/api/tasks/batch",
+        json={"ids": [id, id, "missing"]},
+        headers=auth_headers,
+    )
+    results = response.json()["results"]
+    assert [result["status_code"] for result in results] == [200, 400, 404]
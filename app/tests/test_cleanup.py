@@ -0,0 +1,67 @@
+"""The cleanup job runs beside request handling without slowing it down"""
+
+import statistics
+import threading
+import time
+import uuid
+
+import pytest
+
+from benchmarks import seed
+from core.database import SessionLocal
+from main import run_cleanup
+
+EXPIRED_TASKS = 20000
+
+
+@pytest.fixture
+def expired_tasks():
+    """EXPIRED_TASKS done or past-due tasks, owned by users of their own"""
+    run_id = f"test-cleanup-{uuid.uuid4().hex[:8]}"
+    with SessionLocal() as db:
+        seed.seed(
+            db,
+            run_id,
+            users=EXPIRED_TASKS // 1000,
+            tasks_per_user=1000,
+            expired_fraction=1.0,
+        )
+    yield
+    with SessionLocal() as db:
+        seed.remove(db, run_id)
+
+
+def _latencies(client, headers, count: int = 0, until=None) -> list[float]:
+    latencies = []
+    while len(latencies) < count or (until is not None and not until()):
+        start = time.perf_counter()
+        response = client.get("/api/tasks/", headers=headers)
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200
+    return latencies
+
+
+def _p95(latencies: list[float]) -> float:
+    return statistics.quantiles(latencies, n=20)[-1]
+
+
+def test_latency_steady_during_cleanup(client, auth_headers, task, expired_tasks):
+    _latencies(client, auth_headers, count=10)  # warm up
+    baseline = _latencies(client, auth_headers, count=50)
+
+    stop = threading.Event()
+    result = {}
+    cleanup = threading.Thread(target=lambda: result.update(deleted=run_cleanup(stop)))
+    cleanup.start()
+    try:
+        during = _latencies(
+            client, auth_headers, count=50, until=lambda: not cleanup.is_alive()
+        )
+    finally:
+        stop.set()
+        cleanup.join()
+
+    assert result["deleted"] >= EXPIRED_TASKS
+    # Batches are small and paused between, so requests never queue
+    # behind a long delete
+    assert _p95(during) <= max(3 * _p95(baseline), _p95(baseline) + 0.05)
@@ -0,0 +1,108 @@
+"""Every task route stays within its QUERY_BUDGETS entry
+
+Each request runs with a cold user cache, so the statement count includes
+the user lookup a cache miss costs.
+"""
+
+from datetime import timedelta
+
+from fastapi.routing import APIRoute
+import pytest
+
+from api.routes.task import QUERY_BUDGETS
+from core.database import count_queries
+from core.security import JWTHandler, user_cache
+from main import app
+
+
+def _changes(client, headers, task):
+    # An incremental sync, from the cursor of a full one
+    cursor = client.get("/api/tasks/changes", headers=headers).json()["cursor"]
+    return "/api/tasks/changes", {"params": {"since": cursor}}
+
+
+def _stream(client, headers, task):
+    # Sent without the header, as EventSource does. The stream ends when
+    # its token expires
+    claims = JWTHandler.decode_token(headers["Authorization"].removeprefix("Bearer "))
+    token = JWTHandler.encode_data(
+        {"sub": claims["sub"], "user_id": claims["user_id"]},
+        expires_in=timedelta(seconds=2),
+    )
+    return "/api/tasks/stream", {"params": {"access_token": token}, "headers": {}}
+
+
+# (method, path) -> function of (client, headers, task) returning the URL
+# and any other arguments of the request to count
+REQUESTS = {
+    ("POST", "/api/tasks/"): lambda client, headers, task: (
+        "/api/tasks/",
+        {"json": {"title": "Another task"}},
+    ),
+    ("GET", "/api/tasks/"): lambda client, headers, task: ("/api/tasks/", {}),
+    ("GET", "/api/tasks/{id}"): lambda client, headers, task: (
+        f"/api/tasks/{task['id']}",
+        {},
+    ),
+    ("PUT", "/api/tasks/{id}"): lambda client, headers, task: (
+        f"/api/tasks/{task['id']}",
+        {"json": {"title": "Replaced"}},
+    ),
+    ("PATCH", "/api/tasks/{id}"): lambda client, headers, task: (
+        f"/api/tasks/{task['id']}",
+        {"json": {"status": "done"}},
+    ),
+    ("DELETE", "/api/tasks/{id}"): lambda client, headers, task: (
+        f"/api/tasks/{task['id']}",
+        {},
+    ),
+    ("POST", "/api/tasks/batch"): lambda client, headers, task: (
+        "/api/tasks/batch",
+        {"json": {"items": [{"title": "First"}, {"title": "Second"}]}},
+    ),
+    ("PATCH", "/api/tasks/batch"): lambda client, headers, task: (
+        "/api/tasks/batch",
+        {"json": {"items": [{"id": task["id"], "title": "Renamed"}]}},
+    ),
+    ("DELETE", "/api/tasks/batch"): lambda client, headers, task: (
+        "/api/tasks/batch",
+        {"json": {"ids": [task["id"]]}},
+    ),
+    ("GET", "/api/tasks/changes"): _changes,
+    ("GET", "/api/tasks/stats"): lambda client, headers, task: ("/api/tasks/stats", {}),
+    ("GET", "/api/tasks/stream"): _stream,
+    ("GET", "/api/tasks/export"): lambda client, headers, task: ("/api/tasks/export", {}),
+    ("POST", "/api/tasks/import"): lambda client, headers, task: (
+        "/api/tasks/import",
+        {"content": b'{"title": "Imported"}\n{"title": "Also imported"}\n'},
+    ),
+}
+
+
+def _task_routes():
+    for route in app.routes:
+        if isinstance(route, APIRoute) and route.path.startswith("/api/tasks"):
+            for method in route.methods:
+                yield method, route.path
+
+
+def test_every_task_route_has_a_budget():
+    assert set(_task_routes()) <= set(QUERY_BUDGETS)
+
+
+def test_every_budget_is_checked():
+    assert set(REQUESTS) == set(QUERY_BUDGETS)
+
+
+@pytest.mark.parametrize("route", sorted(REQUESTS), ids=" ".join)
+def test_route_within_query_budget(route, client, auth_headers, task):
+    method, _ = route
+    url, kwargs = REQUESTS[route](client, auth_headers, task)
+    kwargs = {"headers": auth_headers, **kwargs}
+    user_cache.clear()
+
+    with count_queries() as counter:
+        response = client.request(method, url, **kwargs)
+
+    assert response.status_code < 300, response.text
+    assert counter[0] <= QUERY_BUDGETS[route]
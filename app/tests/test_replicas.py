@@ -0,0 +1,70 @@
+"""A cross-site client reads its own writes from the primary"""
+
+import time
+
+import pytest
+
+from core.config import Config
+from core.replicas import (
+    LAST_WRITE_COOKIE,
+    LAST_WRITE_HEADER,
+    Replica,
+    replica_router,
+)
+
+FRONTEND = {"Origin": "https://task-flow-frontend-jade.vercel.app"}
+
+
+@pytest.fixture
+def picks(monkeypatch):
+    """Route reads through a healthy stand-in replica and record where each
+    read went. Starts with no recent writers, as a fresh worker would"""
+    replica = Replica(Config.DATABASE_URL, "replica-test")
+    replica.lag = 0.0
+    replica.checked_at = time.monotonic() + 3600
+    monkeypatch.setattr(replica_router, "replicas", [replica])
+    monkeypatch.setattr(replica_router._recent_writers, "get", lambda key: None)
+
+    routed = []
+    pick = replica_router.pick
+
+    def recording_pick(*args, **kwargs):
+        chosen = pick(*args, **kwargs)
+        routed.append(chosen.name if chosen else "primary")
+        return chosen
+
+    monkeypatch.setattr(replica_router, "pick", recording_pick)
+    yield routed
+    replica.engine.dispose()
+
+
+def test_cross_site_write_is_read_from_primary(client, auth_headers, picks):
+    response = client.post(
+        "/api/tasks/", json={"title": "Cross-site"}, headers=auth_headers | FRONTEND
+    )
+    assert response.status_code == 201
+    wrote_at = response.headers[LAST_WRITE_HEADER]
+    cookie = response.headers["set-cookie"]
+    assert "SameSite=none" in cookie and "Secure" in cookie
+    # The secure cookie won't go back over http, and is sent by hand below
+    client.cookies.clear()
+
+    client.get("/api/tasks/", headers=auth_headers | FRONTEND)
+    client.get(
+        "/api/tasks/", headers=auth_headers | FRONTEND | {LAST_WRITE_HEADER: wrote_at}
+    )
+    client.get(
+        "/api/tasks/",
+        headers=auth_headers | FRONTEND | {"Cookie": f"{LAST_WRITE_COOKIE}={wrote_at}"},
+    )
+    assert picks == ["replica-test", "primary", "primary"]
+
+
+def test_same_site_write_sets_lax_cookie(client, auth_headers, picks):
+    response = client.post(
+        "/api/tasks/", json={"title": "Same-site"}, headers=auth_headers
+    )
+    assert response.status_code == 201
+    cookie = response.headers["set-cookie"]
+    assert "SameSite=lax" in cookie and "Secure" not in cookie
+    client.cookies.clear()
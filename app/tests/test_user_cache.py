@@ -0,0 +1,51 @@
+"""Cached users are evicted when a change to their row commits"""
+
+from sqlalchemy import update
+
+from core.database import SessionLocal
+from core.security import JWTHandler, invalidate_cached_users, user_cache
+from models.user_model import User
+
+
+def _user_id(headers) -> str:
+    token = headers["Authorization"].removeprefix("Bearer ")
+    return JWTHandler.decode_token(token)["user_id"]
+
+
+def test_deactivated_user_is_rejected(client, auth_headers):
+    assert client.get("/api/auth/me", headers=auth_headers).status_code == 200
+    user_id = _user_id(auth_headers)
+    assert user_cache.get(user_id) is not None
+
+    with SessionLocal() as db:
+        db.get(User, user_id).is_active = False
+        db.commit()
+
+    assert client.get("/api/auth/me", headers=auth_headers).status_code == 403
+
+
+def test_bulk_deactivation_is_rejected(client, auth_headers):
+    assert client.get("/api/auth/me", headers=auth_headers).status_code == 200
+    user_id = _user_id(auth_headers)
+
+    with SessionLocal() as db:
+        db.execute(update(User).where(User.id == user_id).values(is_active=False))
+        invalidate_cached_users(db, user_id)
+        db.commit()
+
+    assert client.get("/api/auth/me", headers=auth_headers).status_code == 403
+
+
+def test_rolled_back_change_keeps_cached_user(client, auth_headers):
+    assert client.get("/api/auth/me", headers=auth_headers).status_code == 200
+    user_id = _user_id(auth_headers)
+
+    with SessionLocal() as db:
+        db.get(User, user_id).is_active = False
+        db.flush()
+        db.rollback()
+        # Nothing left to evict once the next transaction commits
+        db.commit()
+
+    assert user_cache.get(user_id) is not None
+    assert client.get("/api/auth/me", headers=auth_headers).status_code == 200